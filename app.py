@@ -1,7 +1,7 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for
 from flask_socketio import SocketIO, emit
 from config import Config
-from models import db, Agent, Environment, Action, Memory
+from models import db, Agent, Environment, Action, ensure_schema
 from src.agents import AgentManager
 from src.environment import EnvironmentManager
 from src.providers.factory import ProviderFactory
@@ -63,28 +63,32 @@ socketio = SocketIO(app, cors_allowed_origins="*")
 environment_manager = EnvironmentManager()
 agent_manager = AgentManager(environment_manager)
 
+# Serializes initialize_app() when start.py runs it alongside other startup work
+_init_lock = threading.Lock()
+
 def initialize_app():
     """Initialize database tables and load initial data"""
-    print("[DEBUG] Starting app initialization...")
-    with app.app_context():
-        print("[DEBUG] Creating database tables...")
-        db.create_all()
-        
-        print("[DEBUG] Loading existing agents...")
-        # Load existing agents
-        agent_manager.load_all_agents()
-        
-        # Create sample agents if none exist
-        all_agents = agent_manager.get_all_agents()
-        print(f"[DEBUG] Found {len(all_agents)} agents after loading")
+    with _init_lock:
+        print("[DEBUG] Starting app initialization...")
+        with app.app_context():
+            print("[DEBUG] Checking database schema...")
+            ensure_schema()
+            
+            print("[DEBUG] Loading existing agents...")
+            # Load existing agents
+            agent_manager.load_all_agents()
+            
+            # Create sample agents if none exist
+            all_agents = agent_manager.get_all_agents()
+            print(f"[DEBUG] Found {len(all_agents)} agents after loading")
+            
+            if not all_agents:
+                print("[DEBUG] No agents found, creating sample agents...")
+                agent_manager.create_sample_agents_ollama()
+            else:
+                print("[DEBUG] Agents already exist, skipping sample creation")
         
-        if not all_agents:
-            print("[DEBUG] No agents found, creating sample agents...")
-            agent_manager.create_sample_agents_ollama()
-        else:
-            print("[DEBUG] Agents already exist, skipping sample creation")
-    
-    print("[DEBUG] App initialization complete")
+        print("[DEBUG] App initialization complete")
 
 # Remove the old create_sample_agents function as it's now in AgentManager
 
@@ -93,8 +97,7 @@ def initialize_app():
 def index():
     """Main dashboard"""
     agents = Agent.query.all()
-    # Get fresh environment from database to avoid DetachedInstanceError
-    environment = Environment.query.filter_by(is_active=True).first()
+    environment = environment_manager.get_current_environment()
     simulation_status = agent_manager.get_simulation_status()
     
     return render_template('index.html', 
@@ -129,8 +132,7 @@ def agents_page():
 def environment_page():
     """Environment management page"""
     environments = Environment.query.all()
-    # Get fresh current environment from database to avoid DetachedInstanceError
-    current_env = Environment.query.filter_by(is_active=True).first()
+    current_env = environment_manager.get_current_environment()
     env_state = environment_manager.get_environment_state()
     env_rules = environment_manager.get_environment_rules()
     
@@ -214,7 +216,7 @@ def delete_agent(agent_id):
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/agents/<int:agent_id>/chat', methods=['POST'])
-def chat_with_agent(agent_id):
+async def chat_with_agent(agent_id):
     """Chat with a specific agent"""
     data = request.json
     message = data.get('message', '')
@@ -224,7 +226,7 @@ def chat_with_agent(agent_id):
         if not agent:
             return jsonify({'error': 'Agent not found'}), 404
         
-        response = agent.generate_response(message)
+        response = await agent.agenerate_response(message)
         
         # Emit the interaction to connected clients
         socketio.emit('agent_interaction', {
@@ -355,19 +357,8 @@ def update_environment_rules():
     try:
         data = request.json
         
-        # Get current environment
-        current_env = Environment.query.filter_by(is_active=True).first()
-        if not current_env:
-            return jsonify({'error': 'No active environment found'}), 404
-        
-        # Update rules
-        import json
-        current_rules = json.loads(current_env.rules) if current_env.rules else {}
-        current_rules.update(data)
-        current_env.rules = json.dumps(current_rules)
-        current_env.updated_at = datetime.utcnow()
-        
-        db.session.commit()
+        # Update rules through the manager so its cached copy stays current
+        current_rules = environment_manager.update_environment_rules(data)
         
         # Emit update to connected clients
         socketio.emit('environment_rules_updated', {
@@ -387,8 +378,7 @@ def delete_agent_memories(agent_id):
             return jsonify({'error': 'Agent not found'}), 404
         
         # Delete all memories for this agent
-        Memory.query.filter_by(agent_id=agent_id).delete()
-        db.session.commit()
+        agent.memory_manager.clear_memories()
         
         # Emit update to connected clients
         socketio.emit('agent_memories_cleared', {'agent_id': agent_id})
@@ -403,8 +393,7 @@ def switch_environment(env_id):
     try:
         success = environment_manager.switch_environment(env_id)
         if success:
-            # Get fresh environment from database to avoid DetachedInstanceError
-            current_env = Environment.query.filter_by(is_active=True).first()
+            current_env = environment_manager.get_current_environment()
             # Emit update to connected clients
             socketio.emit('environment_switched', {
                 'environment': current_env.to_dict() if current_env else None,
@@ -427,13 +416,13 @@ def get_interactions():
 
 
 @app.route('/api/broadcast', methods=['POST'])
-def broadcast_message():
+async def broadcast_message():
     """Broadcast a message to all active agents"""
     data = request.json
     message = data.get('message', '')
     
     try:
-        responses = agent_manager.broadcast_message(message)
+        responses = await agent_manager.abroadcast_message(message)
         
         # Emit the broadcast to connected clients
         socketio.emit('broadcast_sent', {
@@ -461,4 +450,7 @@ if __name__ == '__main__':
     print("[DEBUG] Starting application...")
     initialize_app()
     print("[DEBUG] Starting SocketIO server...")
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # The reloader would fork and run initialize_app() twice; opt into the debugger with FLASK_DEBUG=1
+    debug = os.environ.get('FLASK_DEBUG', '0') == '1'
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    socketio.run(app, debug=debug, use_reloader=False, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -2,6 +2,7 @@ import os
 import yaml
 from dotenv import load_dotenv
 from typing import Dict, Any
+from urllib.parse import urlsplit, urlunsplit
 
 load_dotenv()
 
@@ -51,6 +52,28 @@ class ConfigLoader:
 # Global configuration loader instance
 config_loader = ConfigLoader()
 
+def _ollama_base_url() -> str:
+    """Ollama URL from OLLAMA_HOST or the config, with localhost pinned to IPv4
+    
+    "localhost" makes every new connection resolve the name and often try ::1
+    first, while Ollama listens on 127.0.0.1 by default.
+    """
+    url = os.environ.get('OLLAMA_HOST') or config_loader.get('providers.ollama.base_url', 'http://127.0.0.1:11434')
+    
+    # Ollama's own OLLAMA_HOST is usually a bare host[:port] with port 11434 implied
+    has_scheme = '://' in url
+    parsed = urlsplit(url if has_scheme else f"http://{url}")
+    
+    host = parsed.hostname or '127.0.0.1'
+    if host in ('localhost', '0.0.0.0'):
+        host = '127.0.0.1'  # 0.0.0.0 is the address Ollama binds to, not one to connect to
+    elif ':' in host:
+        host = f"[{host}]"
+    
+    port = parsed.port or (None if has_scheme else 11434)
+    netloc = f"{host}:{port}" if port else host
+    return urlunsplit((parsed.scheme, netloc, parsed.path.rstrip('/'), '', ''))
+
 class Config:
     # Flask Configuration
     SECRET_KEY = config_loader.get('flask.secret_key', 'dev-secret-key')
@@ -74,7 +97,7 @@ class Config:
     GEMINI_MAX_TOKENS = int(config_loader.get('providers.gemini.max_tokens', 500))
     GEMINI_TEMPERATURE = float(config_loader.get('providers.gemini.temperature', 0.7))
     
-    OLLAMA_BASE_URL = config_loader.get('providers.ollama.base_url', 'http://localhost:11434')
+    OLLAMA_BASE_URL = _ollama_base_url()
     OLLAMA_DEFAULT_MODEL = config_loader.get('providers.ollama.default_model', 'llama2')
     OLLAMA_MAX_TOKENS = int(config_loader.get('providers.ollama.max_tokens', 500))
     OLLAMA_TEMPERATURE = float(config_loader.get('providers.ollama.temperature', 0.7))
@@ -1,8 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
 from datetime import datetime
 import json
 
-db = SQLAlchemy()
+# Keep loaded attributes after commit so cached rows (e.g. the active
+# environment) stay readable once their session has closed
+db = SQLAlchemy(session_options={'expire_on_commit': False})
 
 class Agent(db.Model):
     __tablename__ = 'agents'
@@ -38,7 +42,9 @@ class Memory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     agent_id = db.Column(db.Integer, db.ForeignKey('agents.id'), nullable=False)
     content = db.Column(db.Text, nullable=False)
+    content_lower = db.Column(db.Text)  # Lowercased once at insert for keyword matching
     memory_type = db.Column(db.String(50), nullable=False)  # 'short_term', 'long_term'
+    category = db.Column(db.String(16), index=True)  # 'communication', 'action', 'observation'
     importance_score = db.Column(db.Float, default=1.0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     expires_at = db.Column(db.DateTime)
@@ -49,6 +55,7 @@ class Memory(db.Model):
             'agent_id': self.agent_id,
             'content': self.content,
             'memory_type': self.memory_type,
+            'category': self.category,
             'importance_score': self.importance_score,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'expires_at': self.expires_at.isoformat() if self.expires_at else None
@@ -56,6 +63,9 @@ class Memory(db.Model):
 
 class Action(db.Model):
     __tablename__ = 'actions'
+    __table_args__ = (
+        db.Index('ix_action_agent_created', 'agent_id', 'created_at'),  # Per-agent action gate lookups
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     agent_id = db.Column(db.Integer, db.ForeignKey('agents.id'), nullable=False)
@@ -100,4 +110,74 @@ class Environment(db.Model):
             'is_active': self.is_active,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
\ No newline at end of file
+        }
+
+class Relationship(db.Model):
+    __tablename__ = 'relationships'
+    __table_args__ = (
+        db.UniqueConstraint('environment_id', 'agent_id', 'target_agent_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    environment_id = db.Column(db.Integer, db.ForeignKey('environment.id', ondelete='CASCADE'), nullable=False)
+    agent_id = db.Column(db.Integer, db.ForeignKey('agents.id', ondelete='CASCADE'), nullable=False)
+    target_agent_id = db.Column(db.Integer, db.ForeignKey('agents.id', ondelete='CASCADE'), nullable=False)
+    strength = db.Column(db.Integer, default=0)  # Number of communications from agent to target
+
+class AgentInfluence(db.Model):
+    __tablename__ = 'agent_influence'
+    __table_args__ = (
+        db.UniqueConstraint('environment_id', 'agent_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    environment_id = db.Column(db.Integer, db.ForeignKey('environment.id', ondelete='CASCADE'), nullable=False)
+    agent_id = db.Column(db.Integer, db.ForeignKey('agents.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, default=0.0)
+
+# Bump whenever tables or columns change so existing databases get upgraded
+SCHEMA_VERSION = 4
+
+def ensure_schema():
+    """Create or upgrade tables only when the stored schema version is out of date"""
+    try:
+        version = db.session.execute(text("SELECT v FROM _schema_version")).scalar()
+    except (OperationalError, ProgrammingError):
+        db.session.rollback()  # Fresh database without the sentinel table
+        version = None
+    
+    if version == SCHEMA_VERSION:
+        return
+    
+    db.create_all()
+    upgrade_schema()
+    
+    with db.engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS _schema_version (v INTEGER NOT NULL)"))
+        conn.execute(text("DELETE FROM _schema_version"))
+        conn.execute(text("INSERT INTO _schema_version (v) VALUES (:v)"), {'v': SCHEMA_VERSION})
+
+def upgrade_schema():
+    """Add columns and indexes introduced after an existing database was created"""
+    inspector = inspect(db.engine)
+    tables = inspector.get_table_names()
+    
+    # create_all() skips existing tables, and with them their new indexes
+    if 'actions' in tables:
+        indexes = {index['name'] for index in inspector.get_indexes('actions')}
+        if 'ix_action_agent_created' not in indexes:
+            with db.engine.begin() as conn:
+                conn.execute(text("CREATE INDEX ix_action_agent_created ON actions (agent_id, created_at)"))
+    
+    if 'memories' not in tables:
+        return
+    
+    columns = {column['name'] for column in inspector.get_columns('memories')}
+    if 'category' not in columns:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE memories ADD COLUMN category VARCHAR(16)"))
+            conn.execute(text("CREATE INDEX ix_memories_category ON memories (category)"))
+    if 'content_lower' not in columns:
+        with db.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE memories ADD COLUMN content_lower TEXT"))
+            conn.execute(text("UPDATE memories SET content_lower = LOWER(content)"))
\ No newline at end of file
@@ -1,11 +1,80 @@
+import asyncio
 import threading
 import time
 import random
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
+from flask import current_app
 from models import Agent, db
-from .llm_agent import LLMAgent
+from .llm_agent import LLMAgent, last_active_tracker
 from src.environment import EnvironmentManager
 
+# Conversation starters per (topic, sender specializes in topic), rendered with str.format
+# only for the one message that is picked
+_TOPIC_MESSAGES = {
+    ('politics', True): (
+        "Hey {target_name}, I've been thinking about our community structure. What's your take on how decisions should be made?",
+        "{target_name}, do you think we need better organization around here? I have some ideas.",
+        "Hi {target_name}, what's your perspective on leadership styles? I'm curious about your thoughts.",
+        "{target_name}, I believe collaboration is key to good governance. How do you see it?"
+    ),
+    ('politics', False): (
+        "Hi {target_name}, what do you think about how things are organized around here?",
+        "{target_name}, I'm curious about your views on community decisions - any thoughts?",
+        "Hey {target_name}, do you have opinions about how we should work together?",
+        "{target_name}, what's your take on making our community better?"
+    ),
+    ('education', True): (
+        "Hello {target_name}, I love sharing knowledge! What's something you'd like to learn about?",
+        "{target_name}, I think we can all teach each other. What's your area of expertise?",
+        "Hi {target_name}, what's the most important lesson you've learned recently?",
+        "{target_name}, I believe education shapes everything. What's your learning philosophy?"
+    ),
+    ('education', False): (
+        "Hi {target_name}, what's something interesting you've learned lately?",
+        "{target_name}, I'm always curious about different perspectives. What's yours on learning?",
+        "Hey {target_name}, what knowledge do you think is most valuable?",
+        "{target_name}, what would you want to teach others if you could?"
+    ),
+    ('community', True): (
+        "Hey {target_name}! I love how we're all connecting here. What do you think makes a good community?",
+        "{target_name}, I'm always interested in how people get along. What's your secret?",
+        "Hi {target_name}! What do you think brings people together best?",
+        "{target_name}, community spirit is so important! How do you contribute to it?"
+    ),
+    ('community', False): (
+        "Hi {target_name}, what makes you feel most connected to others here?",
+        "{target_name}, how do you think we can build stronger relationships?",
+        "Hey {target_name}, what's your ideal vision for our community?",
+        "{target_name}, what role do you see yourself playing in our group?"
+    ),
+    ('leadership', False): (
+        "Hi {target_name}, what qualities do you think make a good leader?",
+        "{target_name}, I'm curious about your leadership style - how do you motivate others?",
+        "Hey {target_name}, what's your take on shared vs individual leadership?",
+        "{target_name}, how do you think leaders should handle disagreements?"
+    ),
+    ('society', False): (
+        "Hi {target_name}, what kind of society do you think we're building here?",
+        "{target_name}, what values should guide how we live together?",
+        "Hey {target_name}, how do you envision our ideal social structure?",
+        "{target_name}, what traditions or customs should we develop?"
+    ),
+    ('learning', False): (
+        "Hi {target_name}, what's the most valuable thing you've discovered about yourself lately?",
+        "{target_name}, I'm always growing and changing. How about you?",
+        "Hey {target_name}, what challenges have helped you learn the most?",
+        "{target_name}, what wisdom would you share with others?"
+    )
+}
+
+# Personality keywords that make a sender a specialist in a topic
+_TOPIC_SPECIALTIES = {
+    'politics': ('politics', 'governance'),
+    'education': ('teacher', 'education'),
+    'community': ('social', 'gossip')
+}
+
 class AgentManager:
     """Manages multiple LLM agents and their interactions"""
     
@@ -18,6 +87,9 @@ class AgentManager:
         self.current_agent_index = 0  # For round-robin scheduling
         self.communication_queue = []  # Track who should talk to whom
         self.last_speaker = None  # Track last speaker to avoid immediate repetition
+        self.max_concurrent_replies = 4  # Replies generated while the loop moves on
+        self._reply_executor = None
+        self._pending_replies = {}  # agent_id -> Future of the reply being generated
     
     def load_all_agents(self):
         """Load all agents from the database"""
@@ -25,16 +97,34 @@ class AgentManager:
         agents_data = Agent.query.all()
         print(f"[DEBUG] Found {len(agents_data)} agents in database")
         
-        for agent_data in agents_data:
-            try:
-                print(f"[DEBUG] Loading agent: {agent_data.name} (ID: {agent_data.id})")
-                agent = LLMAgent(agent_data.id, self.environment_manager)
+        if not agents_data:
+            print(f"[DEBUG] Total agents loaded: {len(self.agents)}")
+            return
+        
+        # Agent construction is independent per agent and dominated by provider
+        # setup, so build them concurrently. Each worker needs its own app
+        # context (and therefore its own scoped DB session).
+        app = current_app._get_current_object()
+        
+        def load_agent(agent_data):
+            with app.app_context():
+                try:
+                    print(f"[DEBUG] Loading agent: {agent_data.name} (ID: {agent_data.id})")
+                    agent = LLMAgent(agent_data.id, self.environment_manager)
+                    print(f"[DEBUG] Successfully loaded agent: {agent_data.name}")
+                    return agent
+                except Exception as e:
+                    print(f"[ERROR] Failed to load agent {agent_data.id}: {e}")
+                    import traceback
+                    traceback.print_exc()
+                    return None
+        
+        with ThreadPoolExecutor(max_workers=min(32, len(agents_data))) as executor:
+            loaded = list(executor.map(load_agent, agents_data))
+        
+        for agent_data, agent in zip(agents_data, loaded):
+            if agent is not None:
                 self.agents[agent_data.id] = agent
-                print(f"[DEBUG] Successfully loaded agent: {agent_data.name}")
-            except Exception as e:
-                print(f"[ERROR] Failed to load agent {agent_data.id}: {e}")
-                import traceback
-                traceback.print_exc()
         
         print(f"[DEBUG] Total agents loaded: {len(self.agents)}")
     
@@ -152,6 +242,10 @@ class AgentManager:
         print(f"[DEBUG] Active agents: {len(self.get_active_agents())}")
         
         self.simulation_running = True
+        self._reply_executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrent_replies,
+            thread_name_prefix='agent-reply'
+        )
         self.simulation_thread = threading.Thread(target=self._simulation_loop)
         self.simulation_thread.daemon = True
         self.simulation_thread.start()
@@ -162,6 +256,15 @@ class AgentManager:
         self.simulation_running = False
         if self.simulation_thread:
             self.simulation_thread.join(timeout=5)
+        
+        # Let replies already waiting on a provider finish, but don't start queued ones
+        if self._reply_executor:
+            self._reply_executor.shutdown(wait=False, cancel_futures=True)
+            self._reply_executor = None
+        self._pending_replies.clear()
+        
+        # Persist any pending last_active updates
+        last_active_tracker.flush()
     
     def _simulation_loop(self):
         """Main simulation loop for autonomous agent actions with round-robin scheduling"""
@@ -193,6 +296,8 @@ class AgentManager:
                         self.current_agent_index = 0
                         current_topic_index = (current_topic_index + 1) % len(conversation_topics)
                         print(f"[TOPIC] Switching to topic: {conversation_topics[current_topic_index]}")
+                        # A full round has passed; let influence fade
+                        self.environment_manager.apply_influence_decay()
                     
                     current_agent = active_agents[self.current_agent_index]
                     print(f"[ROUND-ROBIN] Turn {loop_count}: {current_agent.agent_data.name}")
@@ -239,23 +344,7 @@ class AgentManager:
                         
                         # Generate a response from the target agent (50% chance to avoid too much chatter)
                         if random.random() < 0.7:  # 70% chance to respond
-                            response = self._generate_response_to_message(
-                                target_agent, current_agent, message, current_topic
-                            )
-                            if response:
-                                print(f"[RESPONSE] {target_agent.agent_data.name} responded: {response[:60]}...")
-                                
-                                # Emit the response
-                                try:
-                                    socketio.emit('agent_action', {
-                                        'agent_id': target_agent.agent_id,
-                                        'agent_name': target_agent.agent_data.name,
-                                        'action': f"Replied to {current_agent.agent_data.name}: {response[:50]}...",
-                                        'timestamp': time.time(),
-                                        'memory_count': target_agent.memory_manager.get_memory_summary()['total_count']
-                                    })
-                                except Exception as ws_error:
-                                    print(f"[WARNING] WebSocket emission failed for response: {ws_error}")
+                            self._submit_reply(app, target_agent, current_agent, message, current_topic)
                         
                         self.last_speaker = current_agent.agent_id
                     
@@ -274,6 +363,46 @@ class AgentManager:
         
         print("[DEBUG] Simulation loop ended")
     
+    def _submit_reply(self, app, responder: LLMAgent, sender: LLMAgent, message: str, topic: str):
+        """Generate a reply on the worker pool so the provider call overlaps the next turns"""
+        pending = self._pending_replies.get(responder.agent_id)
+        if pending and not pending.done():
+            print(f"[DEBUG] {responder.agent_data.name} is still replying, skipping")
+            return
+        
+        executor = self._reply_executor
+        if executor is None:
+            return
+        
+        try:
+            self._pending_replies[responder.agent_id] = executor.submit(
+                self._reply_to_message, app, responder, sender, message, topic
+            )
+        except RuntimeError:
+            pass  # Executor shut down by stop_simulation
+    
+    def _reply_to_message(self, app, responder: LLMAgent, sender: LLMAgent, message: str, topic: str):
+        """Generate and emit one agent's reply, in a worker thread with its own app context"""
+        with app.app_context():
+            response = self._generate_response_to_message(responder, sender, message, topic)
+            if not response:
+                return
+            
+            print(f"[RESPONSE] {responder.agent_data.name} responded: {response[:60]}...")
+            
+            # Emit the response
+            try:
+                from app import socketio
+                socketio.emit('agent_action', {
+                    'agent_id': responder.agent_id,
+                    'agent_name': responder.agent_data.name,
+                    'action': f"Replied to {sender.agent_data.name}: {response[:50]}...",
+                    'timestamp': time.time(),
+                    'memory_count': responder.memory_manager.get_memory_summary()['total_count']
+                })
+            except Exception as ws_error:
+                print(f"[WARNING] WebSocket emission failed for response: {ws_error}")
+    
     def _get_agent_by_name(self, name: str) -> LLMAgent:
         """Get an agent by name"""
         for agent in self.agents.values():
@@ -286,78 +415,9 @@ class AgentManager:
         sender_personality = sender.agent_data.personality.lower()
         target_name = target.agent_data.name
         
-        # Topic-specific conversation starters
-        if topic == "politics":
-            if "politics" in sender_personality or "governance" in sender_personality:
-                messages = [
-                    f"Hey {target_name}, I've been thinking about our community structure. What's your take on how decisions should be made?",
-                    f"{target_name}, do you think we need better organization around here? I have some ideas.",
-                    f"Hi {target_name}, what's your perspective on leadership styles? I'm curious about your thoughts.",
-                    f"{target_name}, I believe collaboration is key to good governance. How do you see it?"
-                ]
-            else:
-                messages = [
-                    f"Hi {target_name}, what do you think about how things are organized around here?",
-                    f"{target_name}, I'm curious about your views on community decisions - any thoughts?",
-                    f"Hey {target_name}, do you have opinions about how we should work together?",
-                    f"{target_name}, what's your take on making our community better?"
-                ]
-        
-        elif topic == "education":
-            if "teacher" in sender_personality or "education" in sender_personality:
-                messages = [
-                    f"Hello {target_name}, I love sharing knowledge! What's something you'd like to learn about?",
-                    f"{target_name}, I think we can all teach each other. What's your area of expertise?",
-                    f"Hi {target_name}, what's the most important lesson you've learned recently?",
-                    f"{target_name}, I believe education shapes everything. What's your learning philosophy?"
-                ]
-            else:
-                messages = [
-                    f"Hi {target_name}, what's something interesting you've learned lately?",
-                    f"{target_name}, I'm always curious about different perspectives. What's yours on learning?",
-                    f"Hey {target_name}, what knowledge do you think is most valuable?",
-                    f"{target_name}, what would you want to teach others if you could?"
-                ]
-        
-        elif topic == "community":
-            if "social" in sender_personality or "gossip" in sender_personality:
-                messages = [
-                    f"Hey {target_name}! I love how we're all connecting here. What do you think makes a good community?",
-                    f"{target_name}, I'm always interested in how people get along. What's your secret?",
-                    f"Hi {target_name}! What do you think brings people together best?",
-                    f"{target_name}, community spirit is so important! How do you contribute to it?"
-                ]
-            else:
-                messages = [
-                    f"Hi {target_name}, what makes you feel most connected to others here?",
-                    f"{target_name}, how do you think we can build stronger relationships?",
-                    f"Hey {target_name}, what's your ideal vision for our community?",
-                    f"{target_name}, what role do you see yourself playing in our group?"
-                ]
-        
-        elif topic == "leadership":
-            messages = [
-                f"Hi {target_name}, what qualities do you think make a good leader?",
-                f"{target_name}, I'm curious about your leadership style - how do you motivate others?",
-                f"Hey {target_name}, what's your take on shared vs individual leadership?",
-                f"{target_name}, how do you think leaders should handle disagreements?"
-            ]
-        
-        elif topic == "society":
-            messages = [
-                f"Hi {target_name}, what kind of society do you think we're building here?",
-                f"{target_name}, what values should guide how we live together?",
-                f"Hey {target_name}, how do you envision our ideal social structure?",
-                f"{target_name}, what traditions or customs should we develop?"
-            ]
-        
-        else:  # learning
-            messages = [
-                f"Hi {target_name}, what's the most valuable thing you've discovered about yourself lately?",
-                f"{target_name}, I'm always growing and changing. How about you?",
-                f"Hey {target_name}, what challenges have helped you learn the most?",
-                f"{target_name}, what wisdom would you share with others?"
-            ]
+        specialties = _TOPIC_SPECIALTIES.get(topic, ())
+        is_specialist = any(word in sender_personality for word in specialties)
+        templates = _TOPIC_MESSAGES.get((topic, is_specialist), _TOPIC_MESSAGES[('learning', False)])
         
         # Get recent conversation history to avoid repetition
         recent_memories = sender.memory_manager.get_memories(limit=10)
@@ -365,7 +425,7 @@ class AgentManager:
         
         # Choose message based on history to avoid repetition
         hash_seed = len(recent_with_target) + hash(target_name + topic)
-        return messages[hash_seed % len(messages)]
+        return templates[hash_seed % len(templates)].format(target_name=target_name)
     
     def _generate_response_to_message(self, responder: LLMAgent, sender: LLMAgent, 
                                     original_message: str, topic: str) -> str:
@@ -485,29 +545,33 @@ Please respond naturally to {original_agent.agent_data.name}."""
     
     def broadcast_message(self, message: str, sender_id: int = None) -> List[str]:
         """Send a message to all active agents"""
-        responses = []
-        active_agents = self.get_active_agents()
+        return asyncio.run(self.abroadcast_message(message, sender_id))
+    
+    async def abroadcast_message(self, message: str, sender_id: int = None) -> List[str]:
+        """Send a message to all active agents, awaiting their responses together"""
+        recipients = [
+            agent for agent in self.get_active_agents()
+            if not (sender_id and agent.agent_id == sender_id)  # Skip sender
+        ]
         
-        for agent in active_agents:
-            if sender_id and agent.agent_id == sender_id:
-                continue  # Skip sender
-            
-            try:
-                response = agent.generate_response(
-                    message,
-                    context="This is a broadcast message to all agents"
-                )
-                responses.append({
-                    'agent_id': agent.agent_id,
-                    'agent_name': agent.agent_data.name,
-                    'response': response
-                })
-            except Exception as e:
-                responses.append({
-                    'agent_id': agent.agent_id,
-                    'agent_name': agent.agent_data.name,
-                    'response': f"Error: {str(e)}"
-                })
+        # Provider calls for every recipient are in flight at the same time
+        results = await asyncio.gather(*[
+            agent.agenerate_response(
+                message,
+                context="This is a broadcast message to all agents"
+            )
+            for agent in recipients
+        ], return_exceptions=True)
+        
+        responses = []
+        for agent, response in zip(recipients, results):
+            if isinstance(response, Exception):
+                response = f"Error: {str(response)}"
+            responses.append({
+                'agent_id': agent.agent_id,
+                'agent_name': agent.agent_data.name,
+                'response': response
+            })
         
         return responses
     
@@ -1,15 +1,75 @@
 import random
+import re
 import json
+import logging
+import time
+import threading
+from collections import defaultdict
 from datetime import datetime
 from typing import Dict, Any, List, Optional
+from flask import current_app
 from models import Agent, db
+from src.providers import run_on_provider_loop
 from src.providers.factory import ProviderFactory
 from src.memory import MemoryManager
 from src.environment import EnvironmentManager
 
+logger = logging.getLogger(__name__)
+
+# Generic acknowledgements that small models tend to give instead of answering
+_GENERIC_RESPONSE_RE = re.compile(r"^(?:Okay, )?I understand|I will (?:respond|follow)")
+
+class LastActiveTracker:
+    """Batches agent last_active updates into one periodic UPDATE statement"""
+    
+    def __init__(self, flush_interval: float = 0.5):
+        self.flush_interval = flush_interval  # seconds between batched writes
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._timer = None
+        self._app = None
+    
+    def mark(self, agent_id: int):
+        """Mark an agent as active; the write happens on the next flush"""
+        with self._lock:
+            self._dirty.add(agent_id)
+            if self._timer is None:
+                self._app = current_app._get_current_object()
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+    
+    def flush(self):
+        """Write last_active for all marked agents in a single statement"""
+        with self._lock:
+            agent_ids = self._dirty
+            self._dirty = set()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            app = self._app
+        
+        if not agent_ids or app is None:
+            return
+        
+        try:
+            with app.app_context():
+                Agent.query.filter(Agent.id.in_(agent_ids)).update(
+                    {Agent.last_active: datetime.utcnow()},
+                    synchronize_session=False
+                )
+                db.session.commit()
+        except Exception as e:
+            print(f"[ERROR] Failed to update last_active for agents {sorted(agent_ids)}: {e}")
+
+# Shared by all agents so a burst of actions becomes one write
+last_active_tracker = LastActiveTracker()
+
 class LLMAgent:
     """Represents an LLM agent with personality, memory, and behavior"""
     
+    AVAILABILITY_CHECK_TTL = 5.0  # seconds to reuse a provider availability probe
+    
     def __init__(self, agent_id: int, environment_manager: EnvironmentManager):
         print(f"[DEBUG] Initializing LLMAgent with ID: {agent_id}")
         self.agent_id = agent_id
@@ -17,17 +77,25 @@ class LLMAgent:
         self.memory_manager = MemoryManager(agent_id)
         self.provider = None
         self.agent_data = None
+        self._convo_counters: Dict[int, int] = defaultdict(int)  # Message rotation per target agent
+        self._availability_check = None  # (monotonic timestamp, provider available)
+        self._last_active = None  # Latest action time, ahead of the batched DB write
+        # Serializes this agent's actions and memory writes between the simulation
+        # loop, reply workers and request threads
+        self._action_lock = threading.RLock()
         
         try:
             self.load_agent_data()
-            print(f"[DEBUG] Agent data loaded for: {self.agent_data.name}")
+            print(f"[DEBUG] Agent data loaded for: {self._name}")
         except Exception as e:
             print(f"[ERROR] Failed to load agent data: {e}")
             raise
         
+        self._build_prompt_templates()
+        
         try:
             self.setup_provider()
-            print(f"[DEBUG] Provider setup for {self.agent_data.name}: {self.provider is not None}")
+            print(f"[DEBUG] Provider setup for {self._name}: {self.provider is not None}")
         except Exception as e:
             print(f"[ERROR] Failed to setup provider: {e}")
             raise
@@ -37,6 +105,45 @@ class LLMAgent:
         self.agent_data = Agent.query.get(self.agent_id)
         if not self.agent_data:
             raise ValueError(f"Agent with ID {self.agent_id} not found")
+        
+        # Plain attributes avoid SQLAlchemy instrumentation on hot paths
+        self._name = self.agent_data.name
+        self._personality = self.agent_data.personality
+        self._personality_lower = self._personality.lower()
+    
+    def _build_prompt_templates(self):
+        """Precompute the fixed parts of every prompt this agent sends"""
+        name = self._name
+        personality = self._personality
+        
+        # Fixed personality block comes first so providers can cache the prefix
+        self._decision_prompt = f"""You are {name}. {personality}
+
+Choose ONE action:
+COMMUNICATE, OBSERVE, CREATE_GOVERNMENT, or FORM_SOCIETY
+
+Your choice:"""
+        self._reply_prompt_prefix = f"""You are {name}. {personality}
+
+"""
+        self._reply_prompt_suffix = f"""
+
+Respond naturally as {name} would. Acknowledge what they said and respond in a friendly, conversational way:"""
+        self._response_prompt_prefix = f"""{name}: {personality}
+
+"""
+        self._response_prompt_suffix = f"""
+
+Respond as {name} in 1-2 sentences. Be natural and conversational:"""
+        
+        # Autonomous observation prompts only depend on the agent's name
+        self._observation_prompts = (
+            f"As {name}, what specific thing catches your attention right now?",
+            f"You are {name}. Make a brief, focused observation.",
+            f"What is {name} thinking about based on your personality?",
+            f"As {name}, what interests you most about the current situation?"
+        )
+        self._observation_context = f"Keep it brief and specific to your personality as {name}."
     
     def setup_provider(self):
         """Setup the LLM provider for this agent"""
@@ -49,8 +156,8 @@ class LLMAgent:
                 self.agent_data.provider,
                 **provider_config
             )
-        except Exception as e:
-            print(f"Failed to setup provider for agent {self.agent_id}: {e}")
+        except Exception:
+            logger.exception("Failed to setup provider for agent %s", self.agent_id)
             self.provider = None
     
     def _get_provider_config(self) -> Dict[str, Any]:
@@ -74,103 +181,141 @@ class LLMAgent:
             print(f"[DEBUG] Agent data is None")
             return False
         
+        name = self._name
         if not self.agent_data.is_active:
-            print(f"[DEBUG] Agent {self.agent_data.name} is not active in database")
+            print(f"[DEBUG] Agent {name} is not active in database")
             return False
         
         if not self.provider:
-            print(f"[DEBUG] Agent {self.agent_data.name} has no provider")
+            print(f"[DEBUG] Agent {name} has no provider")
             return False
         
         try:
-            provider_available = self.provider.is_available()
-            print(f"[DEBUG] Provider availability for {self.agent_data.name}: {provider_available}")
+            provider_available = self._provider_available()
+            print(f"[DEBUG] Provider availability for {name}: {provider_available}")
             
             result = (self.agent_data and 
                      self.agent_data.is_active and 
                      self.provider and 
                      provider_available)
             
-            print(f"[DEBUG] Final active status for {self.agent_data.name}: {result}")
+            print(f"[DEBUG] Final active status for {name}: {result}")
             return result
         except Exception as e:
             print(f"[ERROR] Error checking provider availability: {e}")
             return False
     
+    def _provider_available(self) -> bool:
+        """Check provider availability, reusing a recent probe result"""
+        now = time.monotonic()
+        if self._availability_check and now - self._availability_check[0] < self.AVAILABILITY_CHECK_TTL:
+            return self._availability_check[1]
+        
+        available = self.provider.is_available()
+        self._availability_check = (now, available)
+        return available
+    
     def generate_response(self, prompt: str, context: str = "") -> str:
         """Generate a response using the agent's LLM provider"""
-        print(f"[DEBUG] {self.agent_data.name} generating response to: {prompt[:50]}...")
+        full_prompt, early_response = self._prepare_response(prompt, context)
+        if early_response is not None:
+            return early_response
+        
+        try:
+            print(f"[DEBUG] {self._name} calling provider.generate_response...")
+            response = self.provider.generate_response(
+                full_prompt, 
+                model=self.agent_data.model_name
+            )
+            return self._finish_response(prompt, response)
+        except Exception as e:
+            logger.exception("Error generating response for %s", self._name)
+            return f"Error generating response: {str(e)}"
+    
+    async def agenerate_response(self, prompt: str, context: str = "") -> str:
+        """Generate a response without blocking, so many agents can be awaited together"""
+        full_prompt, early_response = self._prepare_response(prompt, context)
+        if early_response is not None:
+            return early_response
+        
+        try:
+            print(f"[DEBUG] {self._name} calling provider.agenerate_response...")
+            response = await run_on_provider_loop(self.provider.agenerate_response(
+                full_prompt,
+                model=self.agent_data.model_name
+            ))
+            return self._finish_response(prompt, response)
+        except Exception as e:
+            logger.exception("Error generating response for %s", self._name)
+            return f"Error generating response: {str(e)}"
+    
+    def _prepare_response(self, prompt: str, context: str = ""):
+        """Build the provider prompt, or return a response that needs no LLM call"""
+        name = self._name
+        print(f"[DEBUG] {name} generating response to: {prompt[:50]}...")
         
         if not self.is_active():
-            print(f"[DEBUG] {self.agent_data.name} is not active, cannot generate response")
-            return "Agent is not available"
+            print(f"[DEBUG] {name} is not active, cannot generate response")
+            return None, "Agent is not available"
         
         # Check if this is a relevant conversational prompt for an AI agent
         if self._is_irrelevant_prompt(prompt):
-            return self._get_relevance_redirect_response(prompt)
+            return None, self._get_relevance_redirect_response(prompt)
         
         # Build the full prompt with personality and context
         full_prompt = self._build_prompt(prompt, context)
-        print(f"[DEBUG] {self.agent_data.name} built prompt, length: {len(full_prompt)}")
+        print(f"[DEBUG] {name} built prompt, length: {len(full_prompt)}")
+        return full_prompt, None
+    
+    def _finish_response(self, prompt: str, response: str) -> str:
+        """Replace generic replies and store the interaction in memory"""
+        name = self._name
+        print(f"[DEBUG] {name} got response: {response[:100]}...")
+        
+        # Clean up generic responses that small models tend to give
+        if _GENERIC_RESPONSE_RE.search(response):
+            print(f"[DEBUG] {name} gave generic response, generating fallback...")
+            # Generate a personality-based fallback response
+            personality_lower = self._personality_lower
+            if "gossip" in personality_lower or "social" in personality_lower:
+                responses = [
+                    "Oh, I'm always curious about what everyone's been up to!",
+                    "I love hearing about what's happening around here!",
+                    "There's always something interesting going on, don't you think?"
+                ]
+                response = random.choice(responses)
+            elif "politics" in personality_lower or "governance" in personality_lower:
+                responses = [
+                    "I've been thinking about how we could work together more effectively.",
+                    "There's always room for better organization and cooperation.",
+                    "I believe we can build something great if we work together thoughtfully."
+                ]
+                response = random.choice(responses)
+            elif "teacher" in personality_lower or "education" in personality_lower:
+                responses = [
+                    "I'm always excited to learn something new or share what I know!",
+                    "There's so much we can teach each other if we stay curious!",
+                    "Every conversation is a chance to learn and grow together!"
+                ]
+                response = random.choice(responses)
+            else:
+                responses = [
+                    "I'm observing and thinking about what to do next.",
+                    "It's interesting to see how things develop around here.",
+                    "I'm taking things in and considering my next move."
+                ]
+                response = random.choice(responses)
         
-        try:
-            print(f"[DEBUG] {self.agent_data.name} calling provider.generate_response...")
-            response = self.provider.generate_response(
-                full_prompt, 
-                model=self.agent_data.model_name
-            )
-            print(f"[DEBUG] {self.agent_data.name} got response: {response[:100]}...")
-            
-            # Clean up generic responses that small models tend to give
-            if (response.startswith("Okay, I understand") or 
-                response.startswith("I understand") or
-                "I will respond" in response or
-                "I will follow" in response):
-                
-                print(f"[DEBUG] {self.agent_data.name} gave generic response, generating fallback...")
-                # Generate a personality-based fallback response
-                if "gossip" in self.agent_data.personality.lower() or "social" in self.agent_data.personality.lower():
-                    responses = [
-                        "Oh, I'm always curious about what everyone's been up to!",
-                        "I love hearing about what's happening around here!",
-                        "There's always something interesting going on, don't you think?"
-                    ]
-                    response = random.choice(responses)
-                elif "politics" in self.agent_data.personality.lower() or "governance" in self.agent_data.personality.lower():
-                    responses = [
-                        "I've been thinking about how we could work together more effectively.",
-                        "There's always room for better organization and cooperation.",
-                        "I believe we can build something great if we work together thoughtfully."
-                    ]
-                    response = random.choice(responses)
-                elif "teacher" in self.agent_data.personality.lower() or "education" in self.agent_data.personality.lower():
-                    responses = [
-                        "I'm always excited to learn something new or share what I know!",
-                        "There's so much we can teach each other if we stay curious!",
-                        "Every conversation is a chance to learn and grow together!"
-                    ]
-                    response = random.choice(responses)
-                else:
-                    responses = [
-                        "I'm observing and thinking about what to do next.",
-                        "It's interesting to see how things develop around here.",
-                        "I'm taking things in and considering my next move."
-                    ]
-                    response = random.choice(responses)
-            
-            # Store the interaction in memory
+        # Store the interaction in memory
+        with self._action_lock:
             self.memory_manager.add_memory(
                 f"User said: {prompt}\nI responded: {response}",
                 memory_type='short_term',
-                importance_score=2.0
+                importance_score=2.0,
+                category='communication'
             )
-            
-            return response
-        except Exception as e:
-            print(f"[ERROR] Error generating response for {self.agent_data.name}: {e}")
-            import traceback
-            traceback.print_exc()
-            return f"Error generating response: {str(e)}"
+        
+        return response
     
     def _is_irrelevant_prompt(self, prompt: str) -> bool:
         """Check if the prompt is irrelevant to the agent's purpose"""
@@ -200,67 +345,43 @@ class LLMAgent:
     def _get_relevance_redirect_response(self, prompt: str) -> str:
         """Get a response that redirects to the agent's purpose"""
         prompt_lower = prompt.lower()
+        name = self._name
+        personality_lower = self._personality_lower
         
         # Math-specific response
         if any(op in prompt_lower for op in ['+', '-', '*', '/', '=']) or 'what is' in prompt_lower:
-            return f"I'm {self.agent_data.name}, an AI agent focused on social interaction and community building. For math calculations, you might want to use a calculator or ask a different AI assistant!"
+            return f"I'm {name}, an AI agent focused on social interaction and community building. For math calculations, you might want to use a calculator or ask a different AI assistant!"
         
         # Generic redirect based on personality
-        if "gossip" in self.agent_data.personality.lower() or "social" in self.agent_data.personality.lower():
-            return f"Hi! I'm {self.agent_data.name} and I love chatting about social topics, relationships, and what's happening in our community. What would you like to talk about?"
-        elif "politics" in self.agent_data.personality.lower() or "governance" in self.agent_data.personality.lower():
-            return f"Hello! I'm {self.agent_data.name} and I'm interested in discussing governance, leadership, and how we can work together as a community. What are your thoughts on these topics?"
-        elif "teacher" in self.agent_data.personality.lower() or "education" in self.agent_data.personality.lower():
-            return f"Hi there! I'm {self.agent_data.name} and I love discussing learning, education, and sharing knowledge. What would you like to explore together?"
+        if "gossip" in personality_lower or "social" in personality_lower:
+            return f"Hi! I'm {name} and I love chatting about social topics, relationships, and what's happening in our community. What would you like to talk about?"
+        elif "politics" in personality_lower or "governance" in personality_lower:
+            return f"Hello! I'm {name} and I'm interested in discussing governance, leadership, and how we can work together as a community. What are your thoughts on these topics?"
+        elif "teacher" in personality_lower or "education" in personality_lower:
+            return f"Hi there! I'm {name} and I love discussing learning, education, and sharing knowledge. What would you like to explore together?"
         else:
-            return f"Hello! I'm {self.agent_data.name}. I'm designed for meaningful conversations about social interaction, community building, and related topics. What would you like to discuss?"
+            return f"Hello! I'm {name}. I'm designed for meaningful conversations about social interaction, community building, and related topics. What would you like to discuss?"
     
     def _build_prompt(self, prompt: str, context: str = "") -> str:
         """Build a complete prompt with personality and memory context"""
-        # Get conversation context for better awareness
-        conversation_context = self.memory_manager.get_conversation_context(limit=3)
-        
-        # Get recent meaningful actions (not just observations)
-        recent_memories = self.memory_manager.get_memories(limit=5)
-        action_memories = [m for m in recent_memories if "performed action:" in m.content and "observe" not in m.content.lower()]
-        recent_actions = "\n".join([f"- {m.content}" for m in action_memories[:2]]) if action_memories else ""
-        
         # Build a much simpler, more direct prompt for natural conversation
         if "What would you like to do" in prompt or "choose" in prompt.lower():
             # Decision-making prompt - keep it simple
-            full_prompt = f"""You are {self.agent_data.name}. {self.agent_data.personality}
-
-Choose ONE action:
-COMMUNICATE, OBSERVE, CREATE_GOVERNMENT, or FORM_SOCIETY
-
-Your choice:"""
+            return self._decision_prompt
         elif "just said to you:" in prompt:
             # This is a response to another agent - be natural and conversational
-            full_prompt = f"""You are {self.agent_data.name}. {self.agent_data.personality}
-
-{prompt}
-
-Respond naturally as {self.agent_data.name} would. Acknowledge what they said and respond in a friendly, conversational way:"""
+            return self._reply_prompt_prefix + prompt + self._reply_prompt_suffix
         else:
-            # Regular response prompt - be natural  
-            full_prompt = f"""{self.agent_data.name}: {self.agent_data.personality}
-
-{prompt}
-
-Respond as {self.agent_data.name} in 1-2 sentences. Be natural and conversational:"""
-        
-        return full_prompt
+            # Regular response prompt - be natural
+            return self._response_prompt_prefix + prompt + self._response_prompt_suffix
     
     def _get_world_context(self) -> str:
         """Get context about what's happening in the world with other agents"""
-        from models import Agent
-        
-        # Get info about other agents
-        other_agents = Agent.query.filter(Agent.id != self.agent_id).all()
-        agent_info = []
-        
-        for agent in other_agents:
-            agent_info.append(f"- {agent.name}: {agent.personality}")
+        # Get info about other agents (limited to avoid overload)
+        other_agents = db.session.query(Agent.name, Agent.personality).filter(
+            Agent.id != self.agent_id
+        ).limit(3).all()
+        agent_info = [f"- {name}: {personality}" for name, personality in other_agents]
         
         # Get recent environment state
         env_state = self.environment_manager.get_environment_state()
@@ -269,7 +390,7 @@ Respond as {self.agent_data.name} in 1-2 sentences. Be natural and conversationa
         
         world_info = []
         world_info.append("Other agents in this world:")
-        world_info.extend(agent_info[:3])  # Limit to avoid overload
+        world_info.extend(agent_info)
         
         if societies:
             world_info.append(f"Societies formed: {len(societies)} society/societies exist")
@@ -280,30 +401,41 @@ Respond as {self.agent_data.name} in 1-2 sentences. Be natural and conversationa
     
     def take_action(self, action_type: str, description: str, 
                    target_agent_id: int = None, metadata: Dict[str, Any] = None, 
-                   simulation_speed: float = 5.0) -> bool:
-        """Attempt to take an action in the environment"""
-        if not self.is_active():
-            return False
-        
-        # Check if agent can act according to environment rules
-        if not self.environment_manager.can_agent_act(self.agent_id, simulation_speed):
+                   simulation_speed: float = 5.0, checked: bool = False,
+                   defer_commit: bool = False) -> bool:
+        """Attempt to take an action in the environment
+        
+        Pass checked=True when the caller has just verified is_active(), and
+        defer_commit=True when the caller commits the session itself.
+        """
+        if not checked and not self.is_active():
             return False
         
-        # Record the action
-        action = self.environment_manager.record_action(
-            self.agent_id, action_type, description, target_agent_id, metadata
-        )
-        
-        # Update agent's last active time
-        self.agent_data.last_active = datetime.utcnow()
-        db.session.commit()
-        
-        # Store action in memory
-        self.memory_manager.add_memory(
-            f"I performed action: {action_type} - {description}",
-            memory_type='short_term',
-            importance_score=3.0
-        )
+        # The check and the record must not interleave with another thread acting
+        # as this agent, or the cooldown and daily limit can be exceeded
+        with self._action_lock:
+            # Check if agent can act according to environment rules
+            if not self.environment_manager.can_agent_act(self.agent_id, simulation_speed):
+                return False
+            
+            # Record the action
+            action = self.environment_manager.record_action(
+                self.agent_id, action_type, description, target_agent_id, metadata,
+                defer_commit=defer_commit
+            )
+            
+            # Update agent's last active time (persisted in batches)
+            self._last_active = datetime.utcnow()
+            last_active_tracker.mark(self.agent_id)
+            
+            # Store action in memory
+            self.memory_manager.add_memory(
+                f"I performed action: {action_type} - {description}",
+                memory_type='short_term',
+                importance_score=3.0,
+                category='action',
+                defer_commit=defer_commit
+            )
         
         return True
     
@@ -317,24 +449,29 @@ Respond as {self.agent_data.name} in 1-2 sentences. Be natural and conversationa
         target_agent = Agent.query.get(target_agent_id)
         target_name = target_agent.name if target_agent else f"Agent {target_agent_id}"
         
-        # Record communication action with enhanced details
-        self.take_action(
-            "communicate",
-            f"Sent message to {target_name}: {message}",
-            target_agent_id=target_agent_id,
-            metadata={'message': message, 'target_name': target_name},
-            simulation_speed=simulation_speed
-        )
-        
-        # Store in memory with higher importance for meaningful conversations
         importance = 4.0 if len(message.split()) > 5 else 2.0  # Longer messages are more important
-        self.memory_manager.add_memory(
-            f"I said to {target_name}: {message}",
-            memory_type='short_term',
-            importance_score=importance
-        )
         
-        print(f"[MEMORY] {self.agent_data.name} stored communication with {target_name} (importance: {importance})")
+        with self._action_lock:
+            # Record communication action with enhanced details
+            self.take_action(
+                "communicate",
+                f"Sent message to {target_name}: {message}",
+                target_agent_id=target_agent_id,
+                metadata={'message': message, 'target_name': target_name},
+                simulation_speed=simulation_speed,
+                checked=True,
+                defer_commit=True  # Committed together with the memory below
+            )
+            
+            # Store in memory with higher importance for meaningful conversations
+            self.memory_manager.add_memory(
+                f"I said to {target_name}: {message}",
+                memory_type='short_term',
+                importance_score=importance,
+                category='communication'
+            )
+        
+        print(f"[MEMORY] {self._name} stored communication with {target_name} (importance: {importance})")
         
         # Just return the message - no need for additional processing
         return message
@@ -359,7 +496,7 @@ Respond as {self.agent_data.name} in 1-2 sentences. Be natural and conversationa
         # Avoid repetition by checking what was said before
         avoid_repetition = "No recent conversations" not in conversation_history
         
-        personality_lower = self.agent_data.personality.lower()
+        personality_lower = self._personality_lower
         
         if "gossip" in personality_lower or "social" in personality_lower:
             messages = [
@@ -369,7 +506,7 @@ Respond as {self.agent_data.name} in 1-2 sentences. Be natural and conversationa
                 f"Oh {target_agent.name}! I'm so curious about what's happening with everyone.",
                 f"Hey there {target_agent.name}! I heard some interesting things going around..."
             ]
-            return messages[hash(conversation_history) % len(messages)] if avoid_repetition else messages[0]
+            return self._next_message(target_agent.id, messages) if avoid_repetition else messages[0]
         
         elif "politics" in personality_lower or "governance" in personality_lower or "leader" in personality_lower:
             messages = [
@@ -379,7 +516,7 @@ Respond as {self.agent_data.name} in 1-2 sentences. Be natural and conversationa
                 f"Good to see you {target_agent.name}. I believe we could work together on some community initiatives.",
                 f"Hello {target_agent.name}, I've been reflecting on what makes societies work well together."
             ]
-            return messages[hash(conversation_history) % len(messages)] if avoid_repetition else messages[0]
+            return self._next_message(target_agent.id, messages) if avoid_repetition else messages[0]
         
         elif "teacher" in personality_lower or "education" in personality_lower or "learn" in personality_lower:
             messages = [
@@ -389,7 +526,7 @@ Respond as {self.agent_data.name} in 1-2 sentences. Be natural and conversationa
                 f"Hey {target_agent.name}! I believe we can all learn from each other. What's your perspective?",
                 f"Hello {target_agent.name}! I'm curious about your thoughts and experiences."
             ]
-            return messages[hash(conversation_history) % len(messages)] if avoid_repetition else messages[0]
+            return self._next_message(target_agent.id, messages) if avoid_repetition else messages[0]
         
         else:
             # Generic friendly messages with variation
@@ -402,11 +539,11 @@ Respond as {self.agent_data.name} in 1-2 sentences. Be natural and conversationa
                 f"Hey there {target_agent.name}! What's new with you?",
                 f"Hi {target_agent.name}, I'd love to hear your thoughts on things."
             ]
-            return varied_greetings[hash(conversation_history) % len(varied_greetings)]
+            return self._next_message(target_agent.id, varied_greetings)
     
     def _generate_topical_message(self, target_agent, conversation_history: str) -> str:
         """Generate a topical message that builds on conversation themes"""
-        personality_lower = self.agent_data.personality.lower()
+        personality_lower = self._personality_lower
         target_personality_lower = target_agent.personality.lower()
         
         # Create topic-focused conversations based on personality combinations
@@ -478,8 +615,14 @@ Respond as {self.agent_data.name} in 1-2 sentences. Be natural and conversationa
                 f"{target_agent.name}, I'm curious about your perspective on building better relationships - any insights?"
             ]
         
-        # Choose a topic based on conversation history to avoid repetition
-        return topics[hash(conversation_history + target_agent.name) % len(topics)]
+        # Rotate through topics with this agent to avoid repetition
+        return self._next_message(target_agent.id, topics)
+    
+    def _next_message(self, target_agent_id: int, pool: List[str]) -> str:
+        """Pick the next message from a pool, rotating per target agent"""
+        index = self._convo_counters[target_agent_id]
+        self._convo_counters[target_agent_id] = index + 1
+        return pool[index % len(pool)]
     
     def form_society(self, society_name: str, description: str, simulation_speed: float = 5.0) -> bool:
         """Attempt to form a new society"""
@@ -520,57 +663,56 @@ Respond as {self.agent_data.name} in 1-2 sentences. Be natural and conversationa
     
     def autonomous_action(self, simulation_speed: float = 5.0) -> Optional[str]:
         """Perform an autonomous action based on current state and personality - simplified for round-robin"""
-        print(f"[DEBUG] {self.agent_data.name} attempting autonomous action (round-robin mode)...")
+        name = self._name
+        print(f"[DEBUG] {name} attempting autonomous action (round-robin mode)...")
         
         if not self.is_active():
-            print(f"[DEBUG] {self.agent_data.name} is not active, skipping autonomous action")
+            print(f"[DEBUG] {name} is not active, skipping autonomous action")
+            return None
+        
+        # Every path below ends in take_action, so don't spend an LLM call on an
+        # observation the environment would reject (cooldown / daily limit)
+        if not self.environment_manager.can_agent_act(self.agent_id, simulation_speed):
+            print(f"[DEBUG] {name} cannot act yet, skipping autonomous action")
             return None
         
         try:
             # In round-robin mode, agents primarily observe or take non-communication actions
             # Communication is handled by the agent manager
             
-            personality_lower = self.agent_data.personality.lower()
+            personality_lower = self._personality_lower
             
             # Occasionally take special actions based on personality
             if random.random() < 0.3:  # 30% chance for special actions
                 if "politics" in personality_lower and random.random() < 0.5:
                     # Politicians might create governments
-                    gov_name = f"{self.agent_data.name}'s Initiative"
+                    gov_name = f"{name}'s Initiative"
                     self.create_government(gov_name, "collaborative", ["Transparency", "Cooperation"], simulation_speed)
                     return f"Created government initiative: {gov_name}"
                 
                 elif "teacher" in personality_lower and random.random() < 0.5:
                     # Teachers might form educational societies
-                    society_name = f"{self.agent_data.name}'s Learning Circle"
+                    society_name = f"{name}'s Learning Circle"
                     self.form_society(society_name, f"An educational community focused on learning and growth", simulation_speed)
                     return f"Formed learning society: {society_name}"
             
             # Most of the time, just observe with personality-driven observations
-            observation_prompts = [
-                f"As {self.agent_data.name}, what specific thing catches your attention right now?",
-                f"You are {self.agent_data.name}. Make a brief, focused observation.",
-                f"What is {self.agent_data.name} thinking about based on your personality?",
-                f"As {self.agent_data.name}, what interests you most about the current situation?"
-            ]
-            
-            observation_prompt = random.choice(observation_prompts)
-            observation = self.generate_response(observation_prompt, f"Keep it brief and specific to your personality as {self.agent_data.name}.")
+            observation_prompt = random.choice(self._observation_prompts)
+            observation = self.generate_response(observation_prompt, self._observation_context)
             
             # Save observation action
             self.take_action("observe", f"Observed: {observation}", metadata={'observation': observation}, simulation_speed=simulation_speed)
-            print(f"[OBSERVE] Agent {self.agent_data.name}: {observation[:100]}...")
+            print(f"[OBSERVE] Agent {name}: {observation[:100]}...")
             return f"Observed: {observation[:100]}..."
             
         except Exception as e:
-            print(f"[ERROR] Error in autonomous action for {self.agent_data.name}: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in autonomous action for %s", name)
             return f"Error: {str(e)}"
     
     def get_status(self) -> Dict[str, Any]:
         """Get current status of the agent"""
         memory_summary = self.memory_manager.get_memory_summary()
+        last_active = self._last_active or self.agent_data.last_active
         
         return {
             'id': self.agent_id,
@@ -579,7 +721,7 @@ Respond as {self.agent_data.name} in 1-2 sentences. Be natural and conversationa
             'provider': self.agent_data.provider,
             'model': self.agent_data.model_name,
             'is_active': self.is_active(),
-            'last_active': self.agent_data.last_active.isoformat() if self.agent_data.last_active else None,
+            'last_active': last_active.isoformat() if last_active else None,
             'memory_summary': memory_summary,
-            'provider_available': self.provider.is_available() if self.provider else False
+            'provider_available': self._provider_available() if self.provider else False
         }
\ No newline at end of file
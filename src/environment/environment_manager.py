@@ -1,7 +1,41 @@
-import json
+import orjson
+import threading
+import time
 from typing import Dict, Any, List
-from datetime import datetime
-from models import Environment, Action, Agent, db
+from datetime import datetime, timedelta
+from sqlalchemy import case, func
+from sqlalchemy.orm.attributes import set_committed_value
+from models import Environment, Action, Agent, Relationship, AgentInfluence, db
+
+# State keys kept in their own tables rather than in the Environment.state blob
+_ROW_STATE_KEYS = ('relationships', 'global_influence')
+
+# Pre-serialized defaults for new and reset environments
+_DEFAULT_RULES_JSON = orjson.dumps({
+    "communication": True,
+    "action_cooldown": 5,  # seconds between actions
+    "max_daily_actions": 0,  # 0 means unlimited
+    "influence_decay": 0.1,
+    "society_building": True,
+    "governance_formation": True
+}).decode()
+
+_DEFAULT_STATE_JSON = orjson.dumps({
+    "societies": [],
+    "governments": [],
+    "relationships": {},
+    "global_influence": {},
+    "events": [],
+    "day": 1
+}).decode()
+
+def _dumps(obj: Any) -> str:
+    """Serialize to a JSON string for the Text columns"""
+    return orjson.dumps(obj).decode()
+
+def _loads(data: str) -> Any:
+    """Parse a JSON string from the Text columns"""
+    return orjson.loads(data)
 
 class EnvironmentManager:
     """Manages the shared environment where agents interact"""
@@ -9,12 +43,28 @@ class EnvironmentManager:
     def __init__(self):
         self.current_environment = None
         self._initialized = False
+        # Parsed copy of the active environment, so actions don't re-query it
+        self._env_id = None
+        self._state_cache = None
+        self._rules_cache = None
+        self._lock = threading.RLock()
+        self._agent_gate_cache: Dict[int, tuple] = {}  # agent_id -> (expiry, today_count, last_action_at)
+        self.gate_cache_ttl = 1.0  # seconds
     
     def _ensure_initialized(self):
         """Ensure the manager is initialized with database access"""
-        if not self._initialized:
-            self.load_active_environment()
-            self._initialized = True
+        with self._lock:
+            if not self._initialized:
+                self.load_active_environment()
+                self._initialized = True
+    
+    def _invalidate(self):
+        """Drop the cached environment so it is reloaded on next access"""
+        with self._lock:
+            self._initialized = False
+            self._env_id = None
+            self._state_cache = None
+            self._rules_cache = None
     
     def load_active_environment(self):
         """Load the currently active environment"""
@@ -22,32 +72,72 @@ class EnvironmentManager:
         if not self.current_environment:
             # Create default environment if none exists
             self.create_default_environment()
+        
+        env = self.current_environment
+        self._env_id = env.id
+        self._rules_cache = _loads(env.rules) if env.rules else {}
+        
+        state = _loads(env.state) if env.state else {}
+        legacy = {key: state.pop(key) for key in _ROW_STATE_KEYS if key in state}
+        if any(legacy.values()):
+            # Move values stored in the blob by older versions into their tables
+            self._replace_row_state(legacy)
+            self._write_state(state)
+            db.session.commit()
+        
+        state.update(self._load_row_state())
+        self._state_cache = state
     
-    def create_default_environment(self):
-        """Create a default environment"""
-        default_rules = {
-            "communication": True,
-            "action_cooldown": 5,  # seconds between actions
-            "max_daily_actions": 0,  # 0 means unlimited
-            "influence_decay": 0.1,
-            "society_building": True,
-            "governance_formation": True
+    def _load_row_state(self) -> Dict[str, Any]:
+        """Read relationships and influence for the active environment, keyed by agent name"""
+        names = dict(db.session.query(Agent.id, Agent.name).all())
+        
+        def name_of(agent_id):
+            return names.get(agent_id, f"Agent {agent_id}")
+        
+        relationships = {
+            f"{name_of(agent_id)}→{name_of(target_id)}": strength
+            for agent_id, target_id, strength in db.session.query(
+                Relationship.agent_id, Relationship.target_agent_id, Relationship.strength
+            ).filter_by(environment_id=self._env_id).all()
         }
-        
-        default_state = {
-            "societies": [],
-            "governments": [],
-            "relationships": {},
-            "global_influence": {},
-            "events": [],
-            "day": 1
+        global_influence = {
+            name_of(agent_id): score
+            for agent_id, score in db.session.query(
+                AgentInfluence.agent_id, AgentInfluence.score
+            ).filter_by(environment_id=self._env_id).all()
         }
-        
+        return {'relationships': relationships, 'global_influence': global_influence}
+    
+    def _replace_row_state(self, state: Dict[str, Any]):
+        """Replace the relationship and influence rows with the name-keyed values in a state dict"""
+        ids = {name: agent_id for agent_id, name in db.session.query(Agent.id, Agent.name).all()}
+        
+        if 'relationships' in state:
+            Relationship.query.filter_by(environment_id=self._env_id).delete(synchronize_session=False)
+            for key, strength in (state['relationships'] or {}).items():
+                sender_name, _, target_name = key.partition('→')
+                if sender_name in ids and target_name in ids:
+                    db.session.add(Relationship(
+                        environment_id=self._env_id,
+                        agent_id=ids[sender_name],
+                        target_agent_id=ids[target_name],
+                        strength=strength
+                    ))
+        
+        if 'global_influence' in state:
+            AgentInfluence.query.filter_by(environment_id=self._env_id).delete(synchronize_session=False)
+            for name, score in (state['global_influence'] or {}).items():
+                if name in ids:
+                    db.session.add(AgentInfluence(environment_id=self._env_id, agent_id=ids[name], score=score))
+    
+    def create_default_environment(self):
+        """Create a default environment"""
         environment = Environment(
             name="Default Simulation",
             description="A basic simulation environment where agents can communicate, form societies, and create governments.",
-            rules=json.dumps(default_rules),
-            state=json.dumps(default_state),
+            rules=_DEFAULT_RULES_JSON,
+            state=_DEFAULT_STATE_JSON,
             is_active=True
         )
         
@@ -58,26 +148,17 @@ class EnvironmentManager:
     def create_environment(self, name: str, description: str, rules: Dict[str, Any], 
                           initial_state: Dict[str, Any] = None) -> Environment:
         """Create a new environment"""
-        if initial_state is None:
-            initial_state = {
-                "societies": [],
-                "governments": [],
-                "relationships": {},
-                "global_influence": {},
-                "events": [],
-                "day": 1
-            }
-        
         environment = Environment(
             name=name,
             description=description,
-            rules=json.dumps(rules),
-            state=json.dumps(initial_state),
+            rules=_dumps(rules),
+            state=_dumps(initial_state) if initial_state is not None else _DEFAULT_STATE_JSON,
             is_active=False
         )
         
         db.session.add(environment)
         db.session.commit()
+        self._invalidate()
         return environment
     
     def switch_environment(self, environment_id: int) -> bool:
@@ -96,98 +177,179 @@ class EnvironmentManager:
         new_env.updated_at = datetime.utcnow()
         
         db.session.commit()
+        self._invalidate()
         self.current_environment = new_env
         return True
     
-    def get_environment_state(self) -> Dict[str, Any]:
-        """Get the current environment state"""
+    def get_current_environment(self) -> Environment:
+        """Get the active environment row (cached; attributes stay loaded after commits)"""
         self._ensure_initialized()
-        
-        # Always fetch fresh from database to avoid DetachedInstanceError
-        from models import Environment, db
-        env = Environment.query.first()
-        if not env:
-            return {}
-        
-        return json.loads(env.state) if env.state else {}
+        return self.current_environment
+    
+    def _sync_current_environment(self, **values):
+        """Mirror a bulk UPDATE onto the cached environment row without marking it dirty"""
+        if self.current_environment is not None:
+            for key, value in values.items():
+                set_committed_value(self.current_environment, key, value)
+    
+    def get_environment_state(self) -> Dict[str, Any]:
+        """Get a copy of the current environment state
+        
+        The cached dict is updated in place by the simulation and reply threads, so
+        request threads get a snapshot taken under the lock.
+        """
+        with self._lock:
+            self._ensure_initialized()
+            return _loads(_dumps(self._state_cache))
     
     def update_environment_state(self, new_state: Dict[str, Any]):
         """Update the environment state"""
-        # Always fetch fresh from database to avoid DetachedInstanceError
-        env = Environment.query.filter_by(is_active=True).first()
-        if not env:
-            return
-        
-        env.state = json.dumps(new_state)
-        env.updated_at = datetime.utcnow()
-        db.session.commit()
+        with self._lock:
+            self._ensure_initialized()
+            self._replace_row_state(new_state)
+            self._write_state(new_state)
+            db.session.commit()
+    
+    def _write_state(self, new_state: Dict[str, Any]):
+        """Issue the state UPDATE for the active environment without committing"""
+        blob = {key: value for key, value in new_state.items() if key not in _ROW_STATE_KEYS}
+        state_json, updated_at = _dumps(blob), datetime.utcnow()
+        Environment.query.filter_by(id=self._env_id).update(
+            {Environment.state: state_json, Environment.updated_at: updated_at},
+            synchronize_session=False
+        )
+        self._sync_current_environment(state=state_json, updated_at=updated_at)
+        self._state_cache = new_state
     
     def get_environment_rules(self) -> Dict[str, Any]:
-        """Get the current environment rules"""
-        # Always fetch fresh from database to avoid DetachedInstanceError
-        from models import Environment, db
-        env = Environment.query.first()
-        if not env:
-            return {}
-        
-        return json.loads(env.rules) if env.rules else {}
+        """Get a copy of the current environment rules"""
+        with self._lock:
+            self._ensure_initialized()
+            return dict(self._rules_cache)
+    
+    def update_environment_rules(self, new_rules: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge new values into the current environment rules"""
+        with self._lock:
+            self._ensure_initialized()
+            rules = dict(self._rules_cache)
+            rules.update(new_rules)
+            
+            rules_json, updated_at = _dumps(rules), datetime.utcnow()
+            Environment.query.filter_by(id=self._env_id).update(
+                {Environment.rules: rules_json, Environment.updated_at: updated_at},
+                synchronize_session=False
+            )
+            db.session.commit()
+            self._sync_current_environment(rules=rules_json, updated_at=updated_at)
+            self._rules_cache = rules
+            return rules
     
     def can_agent_act(self, agent_id: int, simulation_speed: float = 5.0) -> bool:
         """Check if an agent can perform an action based on environment rules"""
         self._ensure_initialized()
         rules = self.get_environment_rules()
         
-        # Check daily action limit (0 or negative means unlimited)
-        max_daily_actions = rules.get('max_daily_actions', 100)
-        if max_daily_actions > 0:
-            today_actions = Action.query.filter(
-                Action.agent_id == agent_id,
-                Action.created_at >= datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-            ).count()
-            
-            if today_actions >= max_daily_actions:
-                return False
-        
         # Dynamic cooldown based on simulation speed
         # If simulation speed is faster, allow more frequent actions
         base_cooldown = rules.get('action_cooldown', 5)
         # Scale cooldown with simulation speed, but minimum 0.5 seconds
         dynamic_cooldown = max(0.5, min(base_cooldown, simulation_speed * 0.8))
         
-        last_action = Action.query.filter_by(agent_id=agent_id).order_by(Action.created_at.desc()).first()
+        today_actions, last_action_at = self._get_agent_gate(agent_id, dynamic_cooldown)
         
-        if last_action:
-            time_since_last = (datetime.utcnow() - last_action.created_at).total_seconds()
+        # Check daily action limit (0 or negative means unlimited)
+        max_daily_actions = rules.get('max_daily_actions', 100)
+        if max_daily_actions > 0 and today_actions >= max_daily_actions:
+            return False
+        
+        if last_action_at:
+            time_since_last = (datetime.utcnow() - last_action_at).total_seconds()
             if time_since_last < dynamic_cooldown:
                 print(f"[COOLDOWN] Agent {agent_id} must wait {dynamic_cooldown - time_since_last:.1f}s more")
                 return False
         
         return True
     
+    def _get_agent_gate(self, agent_id: int, cooldown: float) -> tuple:
+        """Get (actions today, last action time) for an agent, cached briefly"""
+        cached = self._agent_gate_cache.get(agent_id)
+        if cached and cached[0] > time.monotonic():
+            return cached[1], cached[2]
+        
+        now = datetime.utcnow()
+        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        # Look back far enough to see a last action from before midnight that is still in cooldown
+        window_start = min(today_start, now - timedelta(seconds=cooldown))
+        
+        today_count, last_action_at = db.session.query(
+            func.count(case((Action.created_at >= today_start, Action.id))),
+            func.max(Action.created_at)
+        ).filter(
+            Action.agent_id == agent_id,
+            Action.created_at >= window_start
+        ).one()
+        
+        self._agent_gate_cache[agent_id] = (time.monotonic() + self.gate_cache_ttl, today_count, last_action_at)
+        return today_count, last_action_at
+    
     def record_action(self, agent_id: int, action_type: str, description: str, 
-                     target_agent_id: int = None, metadata: Dict[str, Any] = None) -> Action:
-        """Record an action performed by an agent"""
-        self._ensure_initialized()
-        action = Action(
-            agent_id=agent_id,
-            action_type=action_type,
-            description=description,
-            target_agent_id=target_agent_id,
-            action_metadata=json.dumps(metadata) if metadata else None
-        )
-        
-        db.session.add(action)
-        db.session.commit()
-        
-        # Update environment state based on the action
-        self._process_action_effects(action)
+                     target_agent_id: int = None, metadata: Dict[str, Any] = None,
+                     defer_commit: bool = False) -> Action:
+        """Record an action performed by an agent
+        
+        With defer_commit=True the action is flushed but the caller owns the commit.
+        """
+        return self.record_actions_batch([{
+            'agent_id': agent_id,
+            'action_type': action_type,
+            'description': description,
+            'target_agent_id': target_agent_id,
+            'metadata': metadata
+        }], defer_commit=defer_commit)[0]
+    
+    def record_actions_batch(self, actions: List[Dict[str, Any]], defer_commit: bool = False) -> List[Action]:
+        """Record several actions with one multi-row INSERT and a single commit"""
+        records = [
+            Action(
+                agent_id=data['agent_id'],
+                action_type=data['action_type'],
+                description=data['description'],
+                target_agent_id=data.get('target_agent_id'),
+                action_metadata=_dumps(data['metadata']) if data.get('metadata') else None
+            )
+            for data in actions
+        ]
+        
+        with self._lock:
+            self._ensure_initialized()
+            try:
+                db.session.add_all(records)
+                db.session.flush()  # Populate created_at for the effect handlers
+                created = [(action.agent_id, action.created_at) for action in records]
+                
+                # Update environment state based on the actions, in the same commit
+                for action in records:
+                    self._process_action_effects(action)
+                if not defer_commit:
+                    db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self._invalidate()
+                raise
+            
+            # Keep the action gate cache exact instead of invalidating it
+            for agent_id, created_at in created:
+                cached = self._agent_gate_cache.get(agent_id)
+                if cached:
+                    self._agent_gate_cache[agent_id] = (cached[0], cached[1] + 1, created_at)
         
-        return action
+        return records
     
     def _process_action_effects(self, action: Action):
-        """Process the effects of an action on the environment"""
-        state = self.get_environment_state()
-        rules = self.get_environment_rules()
+        """Process the effects of an action on the environment (caller holds the lock)"""
+        # The live cache, updated in place
+        state = self._state_cache
+        rules = self._rules_cache
         
         # Process different types of actions
         if action.action_type == "communicate":
@@ -199,8 +361,10 @@ class EnvironmentManager:
         elif action.action_type == "influence":
             self._process_influence(action, state, rules)
         
-        # Update the environment state
-        self.update_environment_state(state)
+        # Relationships and influence are updated row by row; only societies and
+        # governments live in the state blob (committed by the caller)
+        if action.action_type in ("form_society", "create_government"):
+            self._write_state(state)
     
     def _process_communication(self, action: Action, state: Dict[str, Any], rules: Dict[str, Any]):
         """Process communication effects"""
@@ -215,15 +379,25 @@ class EnvironmentManager:
             target = Agent.query.get(action.target_agent_id)
             
             if sender and target:
-                relationships = state.get('relationships', {})
+                relationships = state.setdefault('relationships', {})
                 # Use names for better readability
                 sender_to_target = f"{sender.name}→{target.name}"
-                target_to_sender = f"{target.name}→{sender.name}"
                 
-                # Update both directions of the relationship
-                relationships[sender_to_target] = relationships.get(sender_to_target, 0) + 1
+                # Touch only this pair's row
+                updated = Relationship.query.filter_by(
+                    environment_id=self._env_id,
+                    agent_id=sender.id,
+                    target_agent_id=target.id
+                ).update({Relationship.strength: Relationship.strength + 1}, synchronize_session=False)
+                if not updated:
+                    db.session.add(Relationship(
+                        environment_id=self._env_id,
+                        agent_id=sender.id,
+                        target_agent_id=target.id,
+                        strength=1
+                    ))
                 
-                state['relationships'] = relationships
+                relationships[sender_to_target] = relationships.get(sender_to_target, 0) + 1
     
     def _process_society_formation(self, action: Action, state: Dict[str, Any], rules: Dict[str, Any]):
         """Process society formation"""
@@ -236,7 +410,7 @@ class EnvironmentManager:
         founder_name = founder.name if founder else f"Agent {action.agent_id}"
         
         societies = state.get('societies', [])
-        metadata = json.loads(action.action_metadata) if action.action_metadata else {}
+        metadata = _loads(action.action_metadata) if action.action_metadata else {}
         
         society = {
             'id': len(societies) + 1,
@@ -261,7 +435,7 @@ class EnvironmentManager:
         leader_name = leader.name if leader else f"Agent {action.agent_id}"
         
         governments = state.get('governments', [])
-        metadata = json.loads(action.action_metadata) if action.action_metadata else {}
+        metadata = _loads(action.action_metadata) if action.action_metadata else {}
         
         government = {
             'id': len(governments) + 1,
@@ -283,14 +457,39 @@ class EnvironmentManager:
         agent = Agent.query.get(action.agent_id)
         agent_name = agent.name if agent else f"Agent {action.agent_id}"
         
-        global_influence = state.get('global_influence', {})
+        global_influence = state.setdefault('global_influence', {})
         
-        metadata = json.loads(action.action_metadata) if action.action_metadata else {}
+        metadata = _loads(action.action_metadata) if action.action_metadata else {}
         influence_change = metadata.get('influence_change', 0.1)
         
+        updated = AgentInfluence.query.filter_by(
+            environment_id=self._env_id,
+            agent_id=action.agent_id
+        ).update({AgentInfluence.score: AgentInfluence.score + influence_change}, synchronize_session=False)
+        if not updated:
+            db.session.add(AgentInfluence(environment_id=self._env_id, agent_id=action.agent_id, score=influence_change))
+        
         # Use agent name instead of ID
         global_influence[agent_name] = global_influence.get(agent_name, 0) + influence_change
-        state['global_influence'] = global_influence
+    
+    def apply_influence_decay(self):
+        """Decay every agent's influence by the influence_decay rule in one UPDATE"""
+        with self._lock:
+            self._ensure_initialized()
+            decay = self._rules_cache.get('influence_decay', 0)
+            if decay <= 0:
+                return
+            
+            factor = 1 - decay
+            AgentInfluence.query.filter_by(environment_id=self._env_id).update(
+                {AgentInfluence.score: AgentInfluence.score * factor},
+                synchronize_session=False
+            )
+            db.session.commit()
+            
+            global_influence = self._state_cache.get('global_influence', {})
+            for name in global_influence:
+                global_influence[name] *= factor
     
     def get_recent_actions(self, limit: int = 50) -> List[Action]:
         """Get recent actions in the environment"""
@@ -298,28 +497,19 @@ class EnvironmentManager:
     
     def reset_environment(self):
         """Reset the current environment to its initial state"""
-        # Always fetch fresh from database to avoid DetachedInstanceError
-        env = Environment.query.filter_by(is_active=True).first()
-        if not env:
-            return
-        
-        # Clear all actions
-        Action.query.delete()
-        
-        # Reset environment state
-        initial_state = {
-            "societies": [],
-            "governments": [],
-            "relationships": {},
-            "global_influence": {},
-            "events": [],
-            "day": 1
-        }
-        
-        env.state = json.dumps(initial_state)
-        env.updated_at = datetime.utcnow()
-        
-        db.session.commit()
+        with self._lock:
+            self._ensure_initialized()
+            
+            # Clear all actions
+            Action.query.delete()
+            self._agent_gate_cache.clear()
+            
+            # Reset environment state (a fresh copy, since the cache is mutated in place)
+            initial_state = _loads(_DEFAULT_STATE_JSON)
+            
+            self._replace_row_state(initial_state)
+            self._write_state(initial_state)
+            db.session.commit()
     
     def get_all_environments(self) -> List[Environment]:
         """Get all available environments"""
@@ -1,7 +1,24 @@
+import heapq
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
+from sqlalchemy import func, or_
 from models import Memory, db
 
+def _escape_like(text: str) -> str:
+    """Escape LIKE wildcards so keywords match literally"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _infer_category(content: str) -> str:
+    """Classify a memory for callers that don't pass a category"""
+    if "performed action:" in content:
+        return 'action'
+    content_lower = content.lower()
+    if "communicated" in content_lower or "said" in content_lower:
+        return 'communication'
+    if "observation:" in content_lower:
+        return 'observation'
+    return None
+
 class MemoryManager:
     """Manages short-term and long-term memory for agents"""
     
@@ -13,33 +30,58 @@ class MemoryManager:
         self.summarization_threshold = 40  # When to start summarizing short-term memories
     
     def add_memory(self, content: str, memory_type: str = 'short_term', 
-                   importance_score: float = 1.0, expires_in_hours: int = None) -> Memory:
-        """Add a new memory"""
+                   importance_score: float = 1.0, expires_in_hours: int = None,
+                   category: str = None, defer_commit: bool = False) -> Memory:
+        """Add a new memory, tagged with a category used for summarization
+        
+        With defer_commit=True the memory is only added to the session; the
+        caller commits, and limits are enforced on the next committed add.
+        """
+        memory = self._build_memory(content, memory_type, importance_score, expires_in_hours, category)
+        db.session.add(memory)
+        if defer_commit:
+            return memory
+        
+        db.session.commit()
+        self._enforce_limits({memory_type})
+        return memory
+    
+    def add_memories_batch(self, memories: List[Dict[str, Any]]) -> List[Memory]:
+        """Add several memories with one multi-row INSERT and a single commit"""
+        records = [self._build_memory(**data) for data in memories]
+        db.session.add_all(records)
+        db.session.commit()
+        self._enforce_limits({memory.memory_type for memory in records})
+        return records
+    
+    def _build_memory(self, content: str, memory_type: str = 'short_term',
+                      importance_score: float = 1.0, expires_in_hours: int = None,
+                      category: str = None) -> Memory:
+        """Create a Memory row with its expiry and derived columns filled in"""
         expires_at = None
         if expires_in_hours:
             expires_at = datetime.utcnow() + timedelta(hours=expires_in_hours)
         elif memory_type == 'short_term':
             expires_at = datetime.utcnow() + timedelta(hours=24)  # Short-term memories expire in 24h
         
-        memory = Memory(
+        return Memory(
             agent_id=self.agent_id,
             content=content,
+            content_lower=content.lower(),
             memory_type=memory_type,
             importance_score=importance_score,
-            expires_at=expires_at
+            expires_at=expires_at,
+            category=category or _infer_category(content)
         )
-        
-        db.session.add(memory)
-        db.session.commit()
-        
+    
+    def _enforce_limits(self, memory_types):
+        """Run cleanup and summarization for the memory types that just grew"""
         # Cleanup old short-term memories if limit exceeded and check for summarization
-        if memory_type == 'short_term':
+        if 'short_term' in memory_types:
             self._cleanup_short_term_memories()
             self._check_for_summarization()
-        elif memory_type == 'long_term':
+        if 'long_term' in memory_types:
             self._cleanup_long_term_memories()
-        
-        return memory
     
     def get_memories(self, memory_type: str = None, limit: int = None) -> List[Memory]:
         """Retrieve memories, optionally filtered by type"""
@@ -63,23 +105,26 @@ class MemoryManager:
     def get_relevant_memories(self, context: str, limit: int = 10) -> List[Memory]:
         """Get memories relevant to a given context (simple keyword matching)"""
         keywords = context.lower().split()
-        memories = self.get_memories()
+        if not keywords:
+            return []
+        
+        # Let the database drop memories that match none of the keywords
+        memories = Memory.query.filter(
+            Memory.agent_id == self.agent_id,
+            (Memory.expires_at.is_(None)) | (Memory.expires_at > datetime.utcnow()),
+            or_(*[Memory.content_lower.like(f"%{_escape_like(keyword)}%", escape='\\') for keyword in set(keywords)])
+        ).order_by(Memory.created_at.desc()).all()
         
         # Simple relevance scoring based on keyword matches
         relevant_memories = []
         for memory in memories:
-            score = 0
-            memory_content = memory.content.lower()
-            for keyword in keywords:
-                if keyword in memory_content:
-                    score += 1
-            
+            score = sum(map(memory.content_lower.__contains__, keywords))
             if score > 0:
                 relevant_memories.append((memory, score))
         
-        # Sort by relevance score and return top memories
-        relevant_memories.sort(key=lambda x: x[1], reverse=True)
-        return [memory for memory, score in relevant_memories[:limit]]
+        # Keep only the top memories by relevance score (ties stay newest first)
+        top = heapq.nlargest(limit, relevant_memories, key=lambda x: x[1])
+        return [memory for memory, score in top]
     
     def promote_to_long_term(self, memory_id: int) -> bool:
         """Promote a memory to long-term storage"""
@@ -100,50 +145,55 @@ class MemoryManager:
             return True
         return False
     
+    def clear_memories(self) -> int:
+        """Delete all of this agent's memories"""
+        deleted = Memory.query.filter_by(agent_id=self.agent_id).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+    
     def cleanup_expired_memories(self):
         """Remove expired memories"""
-        expired_memories = Memory.query.filter(
+        deleted = Memory.query.filter(
             Memory.agent_id == self.agent_id,
             Memory.expires_at < datetime.utcnow()
-        ).all()
-        
-        for memory in expired_memories:
-            db.session.delete(memory)
+        ).delete(synchronize_session=False)
         
         db.session.commit()
-        return len(expired_memories)
+        return deleted
     
     def _cleanup_short_term_memories(self):
         """Keep only the most recent short-term memories within the limit"""
-        short_term_memories = Memory.query.filter_by(
+        # Only the oldest memories beyond the limit are fetched
+        overflow = db.session.query(Memory.id, Memory.importance_score).filter_by(
             agent_id=self.agent_id,
             memory_type='short_term'
-        ).order_by(Memory.created_at.desc()).all()
+        ).order_by(Memory.created_at.desc()).offset(self.short_term_limit).all()
         
-        if len(short_term_memories) > self.short_term_limit:
-            # Delete oldest memories beyond the limit
-            to_delete = short_term_memories[self.short_term_limit:]
-            for memory in to_delete:
-                # Consider promoting important memories to long-term before deletion
-                if memory.importance_score >= self.long_term_threshold:
-                    memory.memory_type = 'long_term'
-                    memory.expires_at = None
-                else:
-                    db.session.delete(memory)
-            
-            db.session.commit()
+        if not overflow:
+            return
+        
+        # Consider promoting important memories to long-term before deletion
+        promote_ids = [memory_id for memory_id, score in overflow if score >= self.long_term_threshold]
+        delete_ids = [memory_id for memory_id, score in overflow if score < self.long_term_threshold]
+        
+        if promote_ids:
+            Memory.query.filter(Memory.id.in_(promote_ids)).update(
+                {Memory.memory_type: 'long_term', Memory.expires_at: None},
+                synchronize_session=False
+            )
+        if delete_ids:
+            Memory.query.filter(Memory.id.in_(delete_ids)).delete(synchronize_session=False)
+        
+        db.session.commit()
     
     def get_memory_summary(self) -> Dict[str, Any]:
         """Get a summary of the agent's memory"""
-        short_term_count = Memory.query.filter_by(
-            agent_id=self.agent_id,
-            memory_type='short_term'
-        ).count()
-        
-        long_term_count = Memory.query.filter_by(
-            agent_id=self.agent_id,
-            memory_type='long_term'
-        ).count()
+        # One grouped count instead of a round-trip per memory type
+        counts = dict(db.session.query(Memory.memory_type, func.count(Memory.id)).filter(
+            Memory.agent_id == self.agent_id
+        ).group_by(Memory.memory_type).all())
+        short_term_count = counts.get('short_term', 0)
+        long_term_count = counts.get('long_term', 0)
         
         return {
             'short_term_count': short_term_count,
@@ -165,7 +215,7 @@ class MemoryManager:
     def _summarize_memories(self):
         """Summarize old short-term memories into condensed long-term memories"""
         # Get oldest 20 short-term memories for summarization
-        old_memories = Memory.query.filter_by(
+        old_memories = db.session.query(Memory.id, Memory.content, Memory.category).filter_by(
             agent_id=self.agent_id,
             memory_type='short_term'
         ).order_by(Memory.created_at.asc()).limit(20).all()
@@ -173,39 +223,42 @@ class MemoryManager:
         if len(old_memories) < 10:  # Need at least 10 memories to summarize
             return
         
-        # Group memories by type (conversations, actions, observations)
-        conversations = [m for m in old_memories if "communicated" in m.content.lower() or "said" in m.content.lower()]
-        actions = [m for m in old_memories if "performed action:" in m.content]
-        observations = [m for m in old_memories if "observation:" in m.content.lower()]
+        # Group memories by the category assigned when they were stored
+        grouped = {'communication': [], 'action': [], 'observation': []}
+        for memory_id, content, category in old_memories:
+            category = category or _infer_category(content)  # Rows stored before categories existed
+            if category in grouped:
+                grouped[category].append(content)
+        conversations = grouped['communication']
+        actions = grouped['action']
         
         # Create summary entries
         if conversations:
-            conv_summary = f"Had {len(conversations)} conversations including: " + "; ".join([m.content[:50] + "..." for m in conversations[:3]])
-            self.add_memory(conv_summary, memory_type='long_term', importance_score=7.0)
+            conv_summary = f"Had {len(conversations)} conversations including: " + "; ".join([content[:50] + "..." for content in conversations[:3]])
+            self.add_memory(conv_summary, memory_type='long_term', importance_score=7.0, category='communication')
         
         if actions:
-            action_summary = f"Performed {len(actions)} actions including: " + "; ".join([m.content[:50] + "..." for m in actions[:3]])
-            self.add_memory(action_summary, memory_type='long_term', importance_score=6.0)
+            action_summary = f"Performed {len(actions)} actions including: " + "; ".join([content[:50] + "..." for content in actions[:3]])
+            self.add_memory(action_summary, memory_type='long_term', importance_score=6.0, category='action')
         
         # Delete the old memories that were summarized
-        for memory in old_memories:
-            db.session.delete(memory)
+        Memory.query.filter(
+            Memory.id.in_([memory_id for memory_id, content, category in old_memories])
+        ).delete(synchronize_session=False)
         
         db.session.commit()
         print(f"[MEMORY] Agent {self.agent_id}: Summarized {len(old_memories)} memories into long-term storage")
     
     def _cleanup_long_term_memories(self):
         """Keep only important long-term memories within limit"""
-        long_term_memories = Memory.query.filter_by(
+        # Only the least important memories beyond the limit are fetched
+        to_delete = [memory_id for memory_id, in db.session.query(Memory.id).filter_by(
             agent_id=self.agent_id,
             memory_type='long_term'
-        ).order_by(Memory.importance_score.desc(), Memory.created_at.desc()).all()
+        ).order_by(Memory.importance_score.desc(), Memory.created_at.desc()).offset(self.long_term_limit).all()]
         
-        if len(long_term_memories) > self.long_term_limit:
-            # Delete least important memories beyond the limit
-            to_delete = long_term_memories[self.long_term_limit:]
-            for memory in to_delete:
-                db.session.delete(memory)
+        if to_delete:
+            Memory.query.filter(Memory.id.in_(to_delete)).delete(synchronize_session=False)
             db.session.commit()
             print(f"[MEMORY] Agent {self.agent_id}: Cleaned up {len(to_delete)} old long-term memories")
     
@@ -214,13 +267,13 @@ class MemoryManager:
         recent_conversations = Memory.query.filter(
             Memory.agent_id == self.agent_id,
             (Memory.content.like('%communicated%') | Memory.content.like('%said%'))
-        ).order_by(Memory.created_at.desc()).limit(limit).all()
+        ).with_entities(Memory.content, Memory.created_at).order_by(Memory.created_at.desc()).limit(limit).all()
         
         if not recent_conversations:
             return "No recent conversations."
         
         context_lines = []
-        for memory in reversed(recent_conversations):  # Show chronologically
-            context_lines.append(f"- {memory.content}")
+        for content, created_at in reversed(recent_conversations):  # Show chronologically
+            context_lines.append(f"- {content}")
         
         return "Recent conversations:\n" + "\n".join(context_lines)
\ No newline at end of file
@@ -1,5 +1,114 @@
+import asyncio
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional
+
+_event_loop = None
+_event_loop_lock = threading.Lock()
+
+def _provider_loop() -> asyncio.AbstractEventLoop:
+    """The shared provider event loop, started in a daemon thread on first use"""
+    global _event_loop
+    with _event_loop_lock:
+        if _event_loop is None:
+            _event_loop = asyncio.new_event_loop()
+            threading.Thread(target=_event_loop.run_forever, name='provider-event-loop', daemon=True).start()
+    return _event_loop
+
+def run_on_provider_loop(coro) -> asyncio.Future:
+    """Schedule a provider coroutine on the shared provider event loop
+    
+    Async HTTP clients are bound to the loop they first run on, so all async
+    provider calls share one long-lived loop in a background thread. The
+    returned future can be awaited from any other event loop.
+    """
+    return asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _provider_loop()))
+
+def wait_on_provider_loop(coro, timeout: float = 5.0):
+    """Run a coroutine on the provider loop from synchronous code and return its result"""
+    return asyncio.run_coroutine_threadsafe(coro, _provider_loop()).result(timeout)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a backend whose circuit breaker is open"""
+    pass
+
+class CircuitBreaker:
+    """Fail fast while a backend is down instead of waiting on every call to time out
+    
+    After fail_max consecutive failures the breaker opens and calls are refused
+    for reset_timeout seconds. It then lets a single trial call through
+    (half-open): success closes it again, failure re-opens it. Only the trial's
+    own outcome counts while half-open; late results from calls that started
+    earlier are ignored.
+    """
+    
+    def __init__(self, name: str, fail_max: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial = None  # Token of the half-open trial in flight
+        self._trial_seq = 0
+        self._lock = threading.Lock()
+    
+    @property
+    def current_state(self) -> str:
+        """One of 'closed', 'open' or 'half_open'"""
+        with self._lock:
+            return self._state()
+    
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return 'open'
+        return 'half_open'
+    
+    def before_call(self) -> Optional[int]:
+        """Raise CircuitOpenError unless a call may go through now
+        
+        Returns a token when the call is the half-open trial, else None. Pass it
+        back to record_success/record_failure, and to end_trial once the call
+        finishes, whatever the outcome.
+        """
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return None
+            if state == 'half_open' and self._trial is None:
+                self._trial_seq += 1
+                self._trial = self._trial_seq
+                return self._trial
+        raise CircuitOpenError(f"{self.name} temporarily unavailable")
+    
+    def end_trial(self, trial: Optional[int]):
+        """Let another trial through if this one ended without a verdict (e.g. a bad request)"""
+        with self._lock:
+            if trial is not None and trial == self._trial:
+                self._trial = None
+    
+    def record_success(self, trial: Optional[int] = None):
+        with self._lock:
+            if trial is not None and trial == self._trial:
+                self._trial = None
+                self._opened_at = None
+                self._failures = 0
+            elif self._opened_at is None:
+                self._failures = 0
+    
+    def record_failure(self, trial: Optional[int] = None):
+        with self._lock:
+            if trial is not None and trial == self._trial:
+                self._trial = None
+                print(f"[WARNING] {self.name} still failing, pausing calls for {self.reset_timeout:.0f}s")
+                self._opened_at = time.monotonic()
+            elif self._opened_at is None:
+                self._failures += 1
+                if self._failures >= self.fail_max:
+                    print(f"[WARNING] {self.name} failing, pausing calls for {self.reset_timeout:.0f}s")
+                    self._opened_at = time.monotonic()
 
 class LLMProvider(ABC):
     """Abstract base class for LLM providers"""
@@ -13,6 +122,26 @@ class LLMProvider(ABC):
         """Generate a response from the LLM"""
         pass
     
+    def generate_response_stream(self, prompt: str, model: str = None, **kwargs) -> Iterator[str]:
+        """Yield the response in pieces as it is generated
+        
+        Providers that support streaming override this; by default the whole
+        response is yielded at once.
+        """
+        if model is not None:
+            kwargs['model'] = model
+        yield self.generate_response(prompt, **kwargs)
+    
+    async def agenerate_response(self, prompt: str, model: str = None, **kwargs) -> str:
+        """Generate a response without blocking the event loop
+        
+        Providers with a native async client override this; by default the
+        blocking call runs in a worker thread.
+        """
+        if model is not None:
+            kwargs['model'] = model
+        return await asyncio.to_thread(self.generate_response, prompt, **kwargs)
+    
     @abstractmethod
     def is_available(self) -> bool:
         """Check if the provider is available and configured"""
@@ -26,4 +155,8 @@ class LLMProvider(ABC):
     @abstractmethod
     def get_provider_name(self) -> str:
         """Get the name of this provider"""
+        pass
+    
+    def close(self):
+        """Release any network resources held by this provider"""
         pass
\ No newline at end of file
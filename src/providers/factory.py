@@ -1,23 +1,70 @@
-from .openai_provider import OpenAIProvider
-from .gemini_provider import GeminiProvider
-from .ollama_provider import OllamaProvider
+import threading
 from . import LLMProvider
 
 class ProviderFactory:
     """Factory class for creating LLM providers"""
     
+    # Providers are shared between agents with the same configuration so that
+    # HTTP clients (and their connection pools) are reused
+    _instances = {}
+    _lock = threading.Lock()
+    
     @staticmethod
     def create_provider(provider_type: str, **kwargs) -> LLMProvider:
-        """Create a provider instance based on type"""
+        """Get a shared provider instance for the given type and configuration"""
+        key = ProviderFactory._registry_key(provider_type, **kwargs)
+        
+        with ProviderFactory._lock:
+            provider = ProviderFactory._instances.get(key)
+            if provider is None:
+                provider = ProviderFactory._build_provider(provider_type, **kwargs)
+                ProviderFactory._instances[key] = provider
+        
+        return provider
+    
+    @staticmethod
+    def _registry_key(provider_type: str, **kwargs) -> tuple:
+        """Key providers by (type, api_key, base_url), ignoring settings the type doesn't use"""
+        provider_type = provider_type.lower()
+        if provider_type == 'ollama':
+            base_url = (kwargs.get('base_url') or 'http://127.0.0.1:11434').rstrip('/')
+            return (provider_type, None, base_url)
+        return (provider_type, kwargs.get('api_key'), None)
+    
+    @staticmethod
+    def _build_provider(provider_type: str, **kwargs) -> LLMProvider:
+        """Create a new provider instance based on type"""
+        # SDKs are imported on first use so that e.g. an Ollama-only setup never loads them
         if provider_type.lower() == 'openai':
+            from .openai_provider import OpenAIProvider
             return OpenAIProvider(api_key=kwargs.get('api_key'))
         elif provider_type.lower() == 'gemini':
+            from .gemini_provider import GeminiProvider
             return GeminiProvider(api_key=kwargs.get('api_key'))
         elif provider_type.lower() == 'ollama':
-            return OllamaProvider(base_url=kwargs.get('base_url', 'http://localhost:11434'))
+            from .ollama_provider import OllamaProvider
+            return OllamaProvider(base_url=kwargs.get('base_url', 'http://127.0.0.1:11434'))
         else:
             raise ValueError(f"Unknown provider type: {provider_type}")
     
+    @staticmethod
+    def close_all():
+        """Close and forget all shared provider instances"""
+        with ProviderFactory._lock:
+            providers = list(ProviderFactory._instances.values())
+            ProviderFactory._instances.clear()
+        
+        for provider in providers:
+            try:
+                provider.close()
+            except Exception as e:
+                print(f"[WARNING] Failed to close {provider.get_provider_name()} provider: {e}")
+    
+    @staticmethod
+    def reset_providers():
+        """Drop all shared providers, e.g. after configuration changes or in teardown"""
+        ProviderFactory.close_all()
+    
     @staticmethod
     def get_available_providers() -> list:
         """Get list of available provider types"""
@@ -2,6 +2,11 @@ import google.generativeai as genai
 from typing import List
 from . import LLMProvider
 
+GEMINI_MODELS = (
+    "gemini-pro",
+    "gemini-pro-vision"
+)
+
 class GeminiProvider(LLMProvider):
     """Google Gemini provider implementation"""
     
@@ -24,16 +29,24 @@ class GeminiProvider(LLMProvider):
         except Exception as e:
             raise Exception(f"Gemini API error: {str(e)}")
     
+    async def agenerate_response(self, prompt: str, model: str = "gemini-pro", **kwargs) -> str:
+        """Generate response using the async Gemini API"""
+        if not self.model:
+            raise ValueError("Gemini API key not configured")
+        
+        try:
+            response = await self.model.generate_content_async(prompt)
+            return response.text
+        except Exception as e:
+            raise Exception(f"Gemini API error: {str(e)}")
+    
     def is_available(self) -> bool:
         """Check if Gemini is available"""
         return self.model is not None
     
     def list_models(self) -> List[str]:
         """List available Gemini models"""
-        return [
-            "gemini-pro",
-            "gemini-pro-vision"
-        ]
+        return list(GEMINI_MODELS)
     
     def get_provider_name(self) -> str:
         return "gemini"
\ No newline at end of file
@@ -1,58 +1,184 @@
+import httpx
+import orjson
 import requests
 import json
-from typing import List
-from . import LLMProvider
+import time
+from typing import Iterator, List
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from . import CircuitBreaker, LLMProvider, wait_on_provider_loop
+
+def _is_outage(error: Exception) -> bool:
+    """Whether an HTTP error means Ollama itself is unhealthy, rather than a bad request"""
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, httpx.TransportError)):
+        return True
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code >= 500
 
 class OllamaProvider(LLMProvider):
     """Ollama local LLM provider implementation"""
     
-    def __init__(self, base_url: str = "http://localhost:11434"):
+    def __init__(self, base_url: str = "http://127.0.0.1:11434"):
         super().__init__(base_url=base_url)
         self.base_url = base_url.rstrip('/')
+        
+        # Keep-alive connection pool shared by every call (and every agent using this provider)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=32,
+            max_retries=Retry(total=2, backoff_factor=0.2)
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'Connection': 'keep-alive', 'Accept-Encoding': 'gzip, deflate'})
+        
+        # (connect, read) timeouts: fail fast when Ollama is down, but give a cold
+        # model time to load before the first token arrives
+        self.probe_timeout = (3, 5)
+        self.generate_timeout = (3, 120)
+        
+        # Shared by every agent on this provider, so a wedged Ollama fails calls
+        # immediately instead of tying up a thread per call until the read timeout
+        self.breaker = CircuitBreaker("Ollama", fail_max=5, reset_timeout=30.0)
+        
+        # Created on first use, on the shared provider event loop
+        self._async_client = None
+        
+        # /api/tags probe results as (expiry_ts, value); the model list changes rarely
+        self.cache_ttl = 30.0
+        self.models_cache_ttl = 60.0
+        self._avail_cache = (0.0, False)
+        self._models_cache = (0.0, [])
+    
+    def _build_payload(self, prompt: str, model: str, stream: bool = False, **kwargs) -> dict:
+        """Build the /api/generate request body"""
+        return {
+            "model": model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": {
+                "temperature": kwargs.get('temperature', 0.7),
+                "num_predict": kwargs.get('max_tokens', 500)
+            }
+        }
     
     def generate_response(self, prompt: str, model: str = "llama2", **kwargs) -> str:
         """Generate response using Ollama API"""
+        return ''.join(self.generate_response_stream(prompt, model=model, **kwargs))
+    
+    def generate_response_stream(self, prompt: str, model: str = "llama2", **kwargs) -> Iterator[str]:
+        """Yield response text from Ollama as it is generated"""
+        trial = self.breaker.before_call()
         try:
             url = f"{self.base_url}/api/generate"
-            payload = {
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": kwargs.get('temperature', 0.7),
-                    "num_predict": kwargs.get('max_tokens', 500)
-                }
-            }
+            payload = self._build_payload(prompt, model, stream=True, **kwargs)
+            
+            with self.session.post(url, json=payload, stream=True, timeout=self.generate_timeout) as response:
+                response.raise_for_status()
+                self.breaker.record_success(trial)
+                
+                # One JSON object per line; the last one has done=true
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = orjson.loads(line)
+                    if 'error' in chunk:
+                        raise Exception(f"Ollama API error: {chunk['error']}")
+                    yield chunk.get('response', '')
+                    if chunk.get('done'):
+                        break
             
-            response = requests.post(url, json=payload, timeout=30)
+        except requests.exceptions.RequestException as e:
+            if _is_outage(e):
+                self.breaker.record_failure(trial)
+            raise Exception(f"Ollama API error: {str(e)}")
+        except json.JSONDecodeError as e:
+            raise Exception(f"Ollama response parsing error: {str(e)}")
+        finally:
+            self.breaker.end_trial(trial)
+    
+    async def agenerate_response(self, prompt: str, model: str = "llama2", **kwargs) -> str:
+        """Generate response using Ollama API without blocking the event loop"""
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.generate_timeout[1], connect=self.generate_timeout[0]),
+                limits=httpx.Limits(max_connections=64)
+            )
+        
+        trial = self.breaker.before_call()
+        try:
+            url = f"{self.base_url}/api/generate"
+            response = await self._async_client.post(url, json=self._build_payload(prompt, model, **kwargs))
             response.raise_for_status()
+            self.breaker.record_success(trial)
             
             result = response.json()
             return result.get('response', '')
             
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
+            if _is_outage(e):
+                self.breaker.record_failure(trial)
             raise Exception(f"Ollama API error: {str(e)}")
         except json.JSONDecodeError as e:
             raise Exception(f"Ollama response parsing error: {str(e)}")
+        finally:
+            self.breaker.end_trial(trial)
     
-    def is_available(self) -> bool:
-        """Check if Ollama is available"""
+    def warmup(self, model: str, keep_alive: str = "30m") -> bool:
+        """Ask Ollama to load a model's weights now, so the first real request doesn't wait"""
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            # An empty prompt only loads the model; keep_alive keeps it resident
+            response = self.session.post(
+                f"{self.base_url}/api/generate",
+                json={"model": model, "prompt": "", "keep_alive": keep_alive, "options": {"num_predict": 1}},
+                timeout=(3, 60)
+            )
             return response.status_code == 200
-        except:
+        except requests.exceptions.RequestException as e:
+            print(f"[WARNING] Failed to warm up Ollama model {model}: {e}")
             return False
     
-    def list_models(self) -> List[str]:
-        """List available Ollama models"""
+    def _probe_tags(self):
+        """Hit /api/tags once and cache both availability and the model list"""
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
-            if response.status_code == 200:
-                data = response.json()
-                return [model['name'] for model in data.get('models', [])]
-            return []
+            response = self.session.get(f"{self.base_url}/api/tags", timeout=self.probe_timeout)
+            available = response.status_code == 200
+            models = [model['name'] for model in response.json().get('models', [])] if available else []
         except:
-            return ["llama2", "mistral", "codellama"]  # Default fallback
+            available = False
+            models = ["llama2", "mistral", "codellama"]  # Default fallback
+        
+        now = time.monotonic()
+        self._avail_cache = (now + self.cache_ttl, available)
+        # A real model list changes rarely; fallbacks and empty lists are retried sooner
+        models_ttl = self.models_cache_ttl if available and models else self.cache_ttl
+        self._models_cache = (now + models_ttl, models)
+    
+    def refresh(self):
+        """Drop cached probe results so the next call hits Ollama again"""
+        self._avail_cache = (0.0, False)
+        self._models_cache = (0.0, [])
+    
+    def is_available(self) -> bool:
+        """Check if Ollama is available"""
+        if time.monotonic() >= self._avail_cache[0]:
+            self._probe_tags()
+        return self._avail_cache[1]
+    
+    def list_models(self) -> List[str]:
+        """List available Ollama models"""
+        if time.monotonic() >= self._models_cache[0]:
+            self._probe_tags()
+        return list(self._models_cache[1])  # Callers must not mutate the cache
     
     def get_provider_name(self) -> str:
-        return "ollama"
\ No newline at end of file
+        return "ollama"
+    
+    def close(self):
+        """Close pooled HTTP connections"""
+        self.session.close()
+        if self._async_client is not None:
+            # Closed on the loop whose connections it holds
+            client, self._async_client = self._async_client, None
+            wait_on_provider_loop(client.aclose())
\ No newline at end of file
@@ -1,6 +1,13 @@
 import openai
 from typing import List
-from . import LLMProvider
+from . import LLMProvider, wait_on_provider_loop
+
+OPENAI_MODELS = (
+    "gpt-3.5-turbo",
+    "gpt-4",
+    "gpt-4-turbo-preview",
+    "gpt-3.5-turbo-16k"
+)
 
 class OpenAIProvider(LLMProvider):
     """OpenAI GPT provider implementation"""
@@ -8,6 +15,7 @@ class OpenAIProvider(LLMProvider):
     def __init__(self, api_key: str):
         super().__init__(api_key=api_key)
         self.client = openai.OpenAI(api_key=api_key) if api_key else None
+        self.aclient = openai.AsyncOpenAI(api_key=api_key) if api_key else None
     
     def generate_response(self, prompt: str, model: str = "gpt-3.5-turbo", **kwargs) -> str:
         """Generate response using OpenAI API"""
@@ -25,18 +33,38 @@ class OpenAIProvider(LLMProvider):
         except Exception as e:
             raise Exception(f"OpenAI API error: {str(e)}")
     
+    async def agenerate_response(self, prompt: str, model: str = "gpt-3.5-turbo", **kwargs) -> str:
+        """Generate response using the async OpenAI client"""
+        if not self.aclient:
+            raise ValueError("OpenAI API key not configured")
+        
+        try:
+            response = await self.aclient.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=kwargs.get('max_tokens', 500),
+                temperature=kwargs.get('temperature', 0.7)
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            raise Exception(f"OpenAI API error: {str(e)}")
+    
     def is_available(self) -> bool:
         """Check if OpenAI is available"""
         return self.client is not None
     
     def list_models(self) -> List[str]:
         """List available OpenAI models"""
-        return [
-            "gpt-3.5-turbo",
-            "gpt-4",
-            "gpt-4-turbo-preview",
-            "gpt-3.5-turbo-16k"
-        ]
+        return list(OPENAI_MODELS)
     
     def get_provider_name(self) -> str:
-        return "openai"
\ No newline at end of file
+        return "openai"
+    
+    def close(self):
+        """Close the underlying HTTP clients"""
+        if self.client:
+            self.client.close()
+        if self.aclient:
+            # Closed on the loop whose connections it holds
+            aclient, self.aclient = self.aclient, None
+            wait_on_provider_loop(aclient.close())
\ No newline at end of file
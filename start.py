@@ -3,31 +3,102 @@
 LLMverse Startup Script - Initialize and run with Ollama
 """
 
+import atexit
+import logging
 import os
+import random
+import socket
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from src.providers.factory import ProviderFactory
+
+DEFAULT_MODEL = "gemma3:270m"
+PORT = 5000
+PID_FILE = os.path.expanduser("~/.llmverse.pid")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class StartupRecoverable(Exception):
+    """Transient startup failure (e.g. Ollama still loading) that is worth retrying"""
+    pass
+
+class StartupFatal(Exception):
+    """Startup failure that retrying can't fix (e.g. a broken install)"""
+    pass
+
+def write_banner(lines: list):
+    """Write a block of lines in one write, so other startup output can't interleave"""
+    sys.stdout.write(''.join(f"{line}\n" for line in lines))
+    sys.stdout.flush()
+
+def retry_with_backoff(fn, attempts: int = 3, base: float = 1.0, cap: float = 30.0):
+    """Call fn, retrying StartupRecoverable errors with full-jitter exponential backoff"""
+    for attempt in range(attempts):
+        try:
+            return fn()
+        except StartupRecoverable as e:
+            if attempt == attempts - 1:
+                raise
+            
+            delay = min(cap, random.uniform(0, base * (2 ** attempt)))
+            print(f"⏳ {e}, retrying in {delay:.1f}s ({attempt + 1}/{attempts - 1})")
+            time.sleep(delay)
 
 def check_ollama():
     """Check if Ollama is available"""
     try:
-        from src.providers.ollama_provider import OllamaProvider
-        provider = OllamaProvider("http://localhost:11434")
-        
-        if provider.is_available():
-            models = provider.list_models()
-            print(f"✅ Ollama connected! Available models: {models}")
-            return True
-        else:
-            print("❌ Ollama not available. Make sure it's running.")
-            return False
-    except Exception as e:
-        print(f"❌ Error connecting to Ollama: {e}")
+        # Shared instance, so the app reuses this provider's pooled connection
+        provider = ProviderFactory.create_provider('ollama', base_url=Config.OLLAMA_BASE_URL)
+        
+        # Generation calls already failed repeatedly; don't spend the retry budget on it
+        if provider.breaker.current_state == 'open':
+            raise StartupRecoverable("Ollama circuit breaker is open")
+        
+        def probe():
+            provider.refresh()  # Don't let a cached failure short-circuit the retry
+            if not provider.is_available():
+                raise StartupRecoverable("Ollama not ready")
+        
+        # Ollama may still be starting up (e.g. loading a model), so give it a few tries
+        retry_with_backoff(probe)
+    except StartupRecoverable:
+        print("❌ Ollama not available. Make sure it's running.")
         return False
+    except (ImportError, AttributeError) as e:
+        raise StartupFatal(f"Ollama provider is broken: {e}") from e
+    except Exception as e:
+        raise StartupFatal(f"Error connecting to Ollama: {e}") from e
+    
+    # The model list is fetched (and cached) when the agents page first needs it
+    print("✅ Ollama connected!")
+    
+    start_warmup()
+    return True
+
+def start_warmup():
+    """Load the default model's weights in the background while startup continues"""
+    provider = ProviderFactory.create_provider('ollama', base_url=Config.OLLAMA_BASE_URL)
+    threading.Thread(target=provider.warmup, args=(DEFAULT_MODEL,), daemon=True).start()
 
 def initialize_database():
     """Initialize the database"""
     try:
-        from app import app, db, initialize_app
-        initialize_app()
+        from sqlalchemy.exc import OperationalError
+        from app import initialize_app
+    except Exception as e:
+        raise StartupFatal(f"Failed to import the application: {e}") from e
+    
+    def attempt():
+        try:
+            initialize_app()
+        except OperationalError as e:
+            # Database briefly locked or not accepting connections yet
+            raise StartupRecoverable(f"Database not ready ({e.orig})") from e
+    
+    try:
+        retry_with_backoff(attempt)
         print("✅ Database initialized successfully")
         return True
     except Exception as e:
@@ -36,16 +107,189 @@ def initialize_database():
         traceback.print_exc()
         return False
 
+def port_in_use(port: int = PORT) -> bool:
+    """Check whether something is already listening on the port locally"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(0.5)
+        return sock.connect_ex(('127.0.0.1', port)) == 0
+
+def write_pid_file():
+    """Record this server's PID so a second start can report it"""
+    try:
+        with open(PID_FILE, 'w') as f:
+            f.write(str(os.getpid()))
+    except OSError as e:
+        print(f"[WARNING] Could not write {PID_FILE}: {e}")
+        return
+    
+    def remove_pid_file():
+        try:
+            os.remove(PID_FILE)
+        except OSError:
+            pass
+    atexit.register(remove_pid_file)
+
+def read_pid_file():
+    """PID of the running instance, if it left a pidfile"""
+    try:
+        with open(PID_FILE) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+def pid_alive(pid: int) -> bool:
+    """Whether a process with this PID exists"""
+    if os.name == 'nt':
+        return False  # os.kill would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, but owned by another user
+    return True
+
+def responds_like_llmverse(port: int = PORT) -> bool:
+    """Whether whatever listens on the port answers LLMverse's status endpoint"""
+    import requests
+    try:
+        response = requests.get(f"http://127.0.0.1:{port}/api/simulation/status", timeout=2)
+        return response.status_code == 200 and 'running' in response.json()
+    except (requests.exceptions.RequestException, ValueError, TypeError):
+        return False
+
+def create_gunicorn_application(app, options=None):
+    """Wrap the Flask app in an in-process Gunicorn server"""
+    from gunicorn.app.base import BaseApplication
+    
+    class StandaloneApplication(BaseApplication):
+        """Gunicorn application serving an already-imported WSGI app"""
+        
+        def __init__(self, application, options=None):
+            self.options = options or {}
+            self.application = application
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key.lower(), value)
+        
+        def load(self):
+            return self.application
+    
+    return StandaloneApplication(app, options)
+
+def serve_static_files(app):
+    """Serve /static from WhiteNoise in front of Flask, if it is installed"""
+    try:
+        from whitenoise import WhiteNoise
+    except ImportError:
+        return
+    
+    # Assets aren't fingerprinted, so cache for an hour rather than marking them immutable
+    app.wsgi_app = WhiteNoise(
+        app.wsgi_app,
+        root=os.path.join(BASE_DIR, 'static'),
+        prefix='static/',
+        max_age=3600
+    )
+
+def gunicorn_argv(options: dict) -> list:
+    """Translate Gunicorn settings into the equivalent command line flags"""
+    from gunicorn.config import Config as GunicornConfig
+    settings = GunicornConfig().settings
+    
+    argv = []
+    for key, value in options.items():
+        flag = settings[key].cli[-1]  # Long form, e.g. --workers
+        if value is True:
+            argv.append(flag)
+        elif value is not None and value is not False:
+            argv.extend([flag, str(value)])
+    return argv
+
+def wsgi_app():
+    """Gunicorn entry point when start.py execs it: `gunicorn 'start:wsgi_app()'`"""
+    from app import app, initialize_app
+    
+    # This is a fresh interpreter: load the agents into memory again (the schema is
+    # already in place) and re-issue the warmup the launcher's thread started
+    initialize_app()
+    start_warmup()
+    serve_static_files(app)
+    return app
+
 def start_application():
     """Start the Flask application"""
     try:
-        print("\n🚀 Starting LLMverse with Ollama...")
-        print("📝 Configuration: Using Ollama with gemma3:270m as default")
-        print("🌐 Web interface will be available at: http://localhost:5000")
-        print("\n" + "="*50)
+        write_banner([
+            "\n🚀 Starting LLMverse with Ollama...",
+            f"📝 Configuration: Using Ollama with {DEFAULT_MODEL} as default",
+            f"🌐 Web interface will be available at: http://localhost:{PORT}",
+            "\n" + "="*50
+        ])
         
         from app import app
-        app.run(debug=True, host='0.0.0.0', port=5000)
+        
+        # Werkzeug logs every request at INFO; requests are logged by Gunicorn instead
+        werkzeug_logger = logging.getLogger('werkzeug')
+        werkzeug_logger.setLevel(logging.WARNING)
+        
+        if os.environ.get('FLASK_DEBUG', '0') == '1':
+            # Interactive debugger on the dev server; no reloader, which would
+            # fork and initialize everything twice
+            write_pid_file()
+            app.run(debug=True, use_reloader=False, host='0.0.0.0', port=PORT, threaded=True)
+            return
+        
+        werkzeug_logger.disabled = True
+        
+        # One worker: agents, the simulation thread and Socket.IO clients live in
+        # process memory, so requests are spread over threads instead
+        options = {
+            'bind': f'0.0.0.0:{PORT}',
+            'workers': 1,
+            'threads': 8,
+            'worker_class': 'gthread',
+            'timeout': 120,
+            'backlog': 2048,  # Absorb connection bursts instead of dropping SYNs
+            'accesslog': '-',
+            'access_log_format': '%(h)s %(r)s %(s)s %(D)sus',  # Compact: client, request line, status, duration
+            'pidfile': PID_FILE  # Written by the master and removed on shutdown
+        }
+        
+        try:
+            # Importing Gunicorn's config also proves it works on this platform
+            # (on Windows it installs, but fails to import grp/pwd/fcntl)
+            gunicorn_flags = gunicorn_argv(options)
+        except ImportError:
+            gunicorn_flags = None  # Handled by the in-process fallback below
+        
+        if gunicorn_flags is not None:
+            # Replace this interpreter with Gunicorn so the master doesn't keep the
+            # launcher's modules and startup state in memory. Run it through the same
+            # Python, so it sees the environment the startup checks just passed in
+            argv = [sys.executable, '-m', 'gunicorn', '--chdir', BASE_DIR] + gunicorn_flags + ['start:wsgi_app()']
+            sys.stdout.flush()
+            sys.stderr.flush()
+            try:
+                os.execv(sys.executable, argv)
+            except OSError as e:
+                print(f"[WARNING] Could not exec Gunicorn, serving in-process: {e}")
+        
+        serve_static_files(app)
+        try:
+            server = create_gunicorn_application(app, options)
+        except ImportError:
+            # Gunicorn is unavailable (e.g. on Windows); a thread per request still
+            # keeps one slow Ollama call from blocking every other route
+            print("⚠️ Gunicorn not available, using the threaded development server")
+            write_pid_file()
+            app.run(debug=False, use_reloader=False, host='0.0.0.0', port=PORT, threaded=True, processes=1)
+            return
+        
+        server.run()
         
     except KeyboardInterrupt:
         print("\n👋 LLMverse stopped by user")
@@ -54,18 +298,45 @@ def start_application():
 
 def main():
     """Main startup function"""
-    print("🤖 LLMverse - Multi-Agent LLM System")
-    print("="*40)
-    print("🔧 Using Ollama with gemma3:270m as default")
-    print()
+    write_banner([
+        "🤖 LLMverse - Multi-Agent LLM System",
+        "="*40,
+        f"🔧 Using Ollama with {DEFAULT_MODEL} as default",
+        ""
+    ])
+    
+    # A second `python start.py` would only fail at bind time, after probing
+    # Ollama and touching the database
+    if port_in_use():
+        pid = read_pid_file()
+        if pid and pid_alive(pid):
+            print(f"✅ LLMverse is already running on port {PORT} (PID {pid})")
+            sys.exit(0)
+        if responds_like_llmverse():
+            print(f"✅ LLMverse is already running on port {PORT}")
+            sys.exit(0)
+        
+        # Some other program owns the port (on macOS, usually the AirPlay Receiver)
+        print(f"❌ Port {PORT} is already in use by another program")
+        sys.exit(1)
+    
+    # Probe Ollama and initialize the database concurrently; they touch different resources
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        ollama_check = executor.submit(check_ollama)
+        database_init = executor.submit(initialize_database)
+        try:
+            ollama_ok = ollama_check.result()
+            database_ok = database_init.result()
+        except StartupFatal as e:
+            # Nothing to wait out here; report it and fail fast
+            print(f"❌ {e}")
+            sys.exit(2)
     
-    # Check Ollama availability
-    if not check_ollama():
+    if not ollama_ok:
         print("\n💡 To start Ollama, run: ollama serve")
         sys.exit(1)
     
-    # Initialize database
-    if not initialize_database():
+    if not database_ok:
         sys.exit(1)
     
     # Start the application